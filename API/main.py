@@ -1,27 +1,115 @@
 # Frontend ---> API ----> logic ----> db ---->Response
 # api/main.py
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import List
+import asyncio
 import sys
 import os
+import time
 
 # Import manager from src
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from src.logic import UserLogic
-from src.logic import PostLogic
-from src.logic import CommentLogic
+from src.backends import load_env, transport_stats
+# Must run before the src imports below, not alongside the imports at the top:
+# those modules read their settings (WRITE_BEHIND, RATE_LIMIT_*, AUTH_REQUIRED,
+# BCRYPT_*, ...) from os.environ into module constants when first imported,
+# so importing them before .env is loaded would silently keep the defaults.
+load_env()
+from src.db import DatabaseManager
+from src.hashing import password_hasher, HasherBusyError, BCRYPT_TARGET_MS
+from src import metrics
+from src.versions import change_counters, etag_matches
+from src.serialization import json_response
+from src.search import search_index, SEARCH_ENABLED
+from src.events import event_broker, TooManySubscribers
+from src.auth import session_tokens, InvalidToken, AUTH_REQUIRED
+from src.ingest import IngestQueueFull, WRITE_BEHIND
+from src.ratelimit import rate_limiter, route_group, retry_after, RATE_LIMIT_ENABLED, RATE_LIMIT_TRUST_PROXY
+from src.services import services, WARM_UP
+from src.logic import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, DEFAULT_FEED_COMMENTS, MAX_FEED_COMMENTS, NOT_OWNER_ERRORS
 
 # -------------------App Setup-----------------
-app = FastAPI(title="Social Media Network API", version="1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if BCRYPT_TARGET_MS:
+        rounds = await asyncio.to_thread(password_hasher.calibrate, BCRYPT_TARGET_MS)
+        print(f"bcrypt cost calibrated to {rounds} rounds for a {BCRYPT_TARGET_MS:g} ms budget")
+    if WARM_UP:
+        print(f"Storage connection warmed up in {await services.warm_up():.2f}s")
+    if SEARCH_ENABLED:
+        started = time.perf_counter()
+        indexed = await services.posts.build_search_index()
+        print(f"Search index built from {indexed} posts in {time.perf_counter() - started:.2f}s")
+    if WRITE_BEHIND:
+        services.post_ingest.start()
+        services.comment_ingest.start()
+    yield
+    if WRITE_BEHIND:
+        # Write out everything already acknowledged before the process exits
+        await services.post_ingest.stop()
+        await services.comment_ingest.stop()
+
+
+app = FastAPI(title="Social Media Network API", version="1.0", lifespan=lifespan)
+
+# Logic objects (async, so handlers never park a threadpool worker on I/O) are
+# built on first use by `services`, keeping this module cheap to import
+
+# ---------------- RATE LIMITING ----------------
+def client_address(request: Request):
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def bearer_user_id(request: Request):
+    scheme, _, token = (request.headers.get("authorization") or "").partition(" ")
+    return session_tokens.user_id(token.strip()) if scheme.lower() == "bearer" else None
+
+
+# Registered before the metrics middleware, which therefore wraps it and counts the 429s
+@app.middleware("http")
+async def limit_request_rate(request: Request, call_next):
+    group = route_group(request.method, request.url.path) if RATE_LIMIT_ENABLED else None
+    if group is not None:
+        wait = rate_limiter.acquire(group, client_address(request), bearer_user_id(request))
+        if wait:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": f"Too many {group} requests, retry later"},
+                headers={"Retry-After": retry_after(wait)},
+            )
+    return await call_next(request)
+
+
+# ---------------- METRICS ----------------
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/posts/{post_id}), not the raw path, to keep series bounded
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"
+        metrics.http_requests_total.inc(request.method, path, str(status))
+        metrics.http_request_duration.observe(time.perf_counter() - started, request.method, path)
 
-# Initialize logic instances
-user_logic = UserLogic()
-post_logic = PostLogic()
-comment_logic = CommentLogic()
 
 # --------------------------Allow Frontend(Streamlit/React) to call the API------------------------------
+# Added last so it is the outermost middleware: responses made by the ones
+# above (such as a 429 from the rate limiter) still carry CORS headers, and
+# preflight requests are answered before they are rate limited
 app.add_middleware(
     CORSMiddleware,
     allow_origins=['*'],
@@ -31,6 +119,118 @@ app.add_middleware(
 )
 
 
+metrics.Gauge("cache_entries", "Entries in the DatabaseManager cache", lambda: DatabaseManager.cache.stats()["size"])
+metrics.Gauge(
+    "cache_lookups", "DatabaseManager cache lookups by result since start",
+    lambda: {("hit",): DatabaseManager.cache.stats()["hits"], ("miss",): DatabaseManager.cache.stats()["misses"]},
+    labelnames=("result",),
+)
+metrics.Gauge("search_index_posts", "Posts in the search index", lambda: search_index.stats()["posts"])
+metrics.Gauge("event_subscribers", "Clients connected to GET /events", lambda: event_broker.stats()["subscribers"])
+metrics.Gauge("auth_tokens_rejected", "Bearer tokens refused as invalid, expired or revoked, since start", lambda: session_tokens.stats()["rejected"])
+metrics.Gauge(
+    "rate_limited", "Requests refused with 429 by route group, since start",
+    lambda: {(group,): count for group, count in rate_limiter.stats()["rejected"].items()},
+    labelnames=("group",),
+)
+metrics.Gauge(
+    "ingest_depth", "Write-behind items queued or being written",
+    lambda: {(queue.kind,): queue.depth for queue in (services.post_ingest, services.comment_ingest)},
+    labelnames=("kind",),
+)
+metrics.Gauge(
+    "db_pool_in_flight", "Supabase HTTP requests in flight per client",
+    lambda: {(client,): stats["in_flight"] for client, stats in transport_stats().items()},
+    labelnames=("client",),
+)
+metrics.Gauge(
+    "db_pool_connections", "Open Supabase HTTP connections per client and state",
+    lambda: {
+        (client, state): count
+        for client, stats in transport_stats().items()
+        for state, count in (("idle", stats["idle_connections"]), ("busy", stats["connections"] - stats["idle_connections"]))
+    },
+    labelnames=("client", "state"),
+)
+metrics.Gauge(
+    "db_pool_timeouts", "Supabase queries that found no free connection in time, since start",
+    lambda: {(client,): stats["pool_timeouts"] for client, stats in transport_stats().items()},
+    labelnames=("client",),
+)
+metrics.Gauge("bcrypt_in_flight", "Password hashes running or queued", lambda: password_hasher.stats()["in_flight"])
+metrics.Gauge("bcrypt_rejected", "Password hashes refused because the queue was full, since start", lambda: password_hasher.stats()["rejected"])
+
+
+# Password hashing runs on a bounded pool; when it is full, shed load fast
+@app.exception_handler(HasherBusyError)
+async def hasher_busy_handler(request: Request, exc: HasherBusyError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(IngestQueueFull)
+async def ingest_full_handler(request: Request, exc: IngestQueueFull):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+def accepted(provisional_id: str):
+    """202 for an item queued for write-behind; GET /ingest/{provisional_id} tracks it"""
+    return JSONResponse(
+        status_code=202,
+        content={"message": "Accepted for writing", "provisional_id": provisional_id, "status": "queued"},
+    )
+
+
+# ---------------- AUTHENTICATION ----------------
+async def authenticate(request: Request):
+    """Claims of the request's bearer token, checked in memory.
+
+    Requests without a token get None, unless AUTH_REQUIRED is set; a bad,
+    expired or revoked token is always a 401.
+    """
+    header = request.headers.get("authorization")
+    if not header:
+        if AUTH_REQUIRED:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        return None
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer":
+        raise HTTPException(status_code=401, detail="Bearer token expected", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return session_tokens.verify(token.strip())
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+def check_user(claims: dict, *user_ids: int):
+    """403 unless a token, when one was sent, belongs to every user in `user_ids`"""
+    if claims is not None and any(user_id != claims["sub"] for user_id in user_ids):
+        raise HTTPException(status_code=403, detail="Token belongs to another user")
+
+
+def caller_id(claims: dict):
+    """User id of the token's owner; None for anonymous requests (AUTH_REQUIRED off)"""
+    return claims["sub"] if claims is not None else None
+
+
+def write_error(result: dict):
+    """HTTPException for an update or delete error: 403 when the row is someone else's"""
+    status_code = 403 if result["error"] in NOT_OWNER_ERRORS.values() else 400
+    return HTTPException(status_code=status_code, detail=result["error"])
+
+
+# ---------------- CONDITIONAL GET ----------------
+def etag_headers(etag: str):
+    # no-cache: clients may keep the body but must revalidate before reusing it
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def not_modified(request: Request, etag: str):
+    """A 304 response if the client already holds `etag`, else None"""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
+
+
 # ---------------- MODELS ----------------
 class RegisterModel(BaseModel):
     username: str
@@ -54,6 +254,10 @@ class PostModel(BaseModel):
     content: str
 
 
+class PostBatchModel(BaseModel):
+    posts: List[PostModel]
+
+
 class PostUpdateModel(BaseModel):
     content: str
 
@@ -64,40 +268,67 @@ class CommentModel(BaseModel):
     content: str
 
 
+class CommentBatchModel(BaseModel):
+    comments: List[CommentModel]
+
+
 class CommentUpdateModel(BaseModel):
     content: str
 
 
 # ---------------- USER ENDPOINTS ----------------
 @app.post("/register")
-def register_user(data: RegisterModel):
-    result = user_logic.register(data.username, data.email, data.password)
+async def register_user(data: RegisterModel):
+    result = await services.users.register(data.username, data.email, data.password)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
 
 
 @app.post("/login")
-def login_user(data: LoginModel):
-    result = user_logic.login(data.email, data.password)
+async def login_user(data: LoginModel):
+    result = await services.users.login(data.email, data.password)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
 
 
+@app.post("/logout")
+async def logout_user(claims: dict = Depends(authenticate)):
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    session_tokens.revoke(claims)
+    return {"message": "Logged out successfully"}
+
+
+@app.get("/users")
+async def get_users(request: Request, ids: str):
+    """Public profiles (id, username) of up to MAX_PAGE_SIZE users, e.g. ?ids=1,2,3"""
+    etag = change_counters.etag("users")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    result = await services.users.get_many(ids)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return json_response(request, result, headers=etag_headers(etag))
+
+
 @app.put("/users/{user_id}")
-def update_user(user_id: int, data: UserUpdateModel):
+async def update_user(user_id: int, data: UserUpdateModel, claims: dict = Depends(authenticate)):
+    check_user(claims, user_id)
     # Fixed: Use instance method instead of static method
-    result = user_logic.update(user_id, data.username, data.email, data.password)
+    result = await services.users.update(user_id, data.username, data.email, data.password)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
 
 
 @app.delete("/users/{user_id}")
-def delete_user(user_id: int):
+async def delete_user(user_id: int, claims: dict = Depends(authenticate)):
+    check_user(claims, user_id)
     # Fixed: Use instance method instead of static method
-    result = user_logic.delete(user_id)
+    result = await services.users.delete(user_id)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
@@ -105,93 +336,239 @@ def delete_user(user_id: int):
 
 # ---------------- POST ENDPOINTS ----------------
 @app.post("/posts")
-def create_post(data: PostModel):
+async def create_post(data: PostModel, claims: dict = Depends(authenticate)):
+    check_user(claims, data.user_id)
+    if WRITE_BEHIND:
+        if not data.content or not data.content.strip():
+            raise HTTPException(status_code=400, detail="Post content cannot be empty")
+        return accepted(services.post_ingest.submit(data.model_dump()))
     # Fixed: Use instance method instead of static method
-    result = post_logic.create(data.user_id, data.content)
+    result = await services.posts.create(data.user_id, data.content, authenticated=claims is not None)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+@app.post("/posts/batch")
+async def create_posts(data: PostBatchModel, claims: dict = Depends(authenticate)):
+    check_user(claims, *(post.user_id for post in data.posts))
+    result = await services.posts.create_many([post.model_dump() for post in data.posts])
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
 
 
 @app.get("/posts")
-def get_posts():
-    # Fixed: Use instance method instead of static method
-    return post_logic.get_all()
+async def get_posts(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    fields: str = None,
+):
+    # Taken before the read: a write racing with it yields a stale tag, never stale data
+    etag = change_counters.etag("posts")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    result = await services.posts.get_page(limit, cursor, fields)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    # Rows are plain JSON already; skip jsonable_encoder and compress large pages
+    return json_response(request, result, headers=etag_headers(etag))
+
+
+# Declared before /posts/{post_id}, which would otherwise capture "search"
+@app.get("/posts/search")
+async def search_posts(request: Request, q: str, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    etag = change_counters.etag("posts")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    result = await services.posts.search(q, limit)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return json_response(request, result, headers=etag_headers(etag))
 
 
 @app.get("/posts/{post_id}")
-def get_post(post_id: int):
+async def get_post(post_id: int):
     # Fixed: Use instance method instead of static method
-    result = post_logic.get(post_id)
+    result = await services.posts.get(post_id)
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
     return result
 
 
 @app.put("/posts/{post_id}")
-def update_post(post_id: int, data: PostUpdateModel):
+async def update_post(post_id: int, data: PostUpdateModel, claims: dict = Depends(authenticate)):
     # Fixed: Use instance method instead of static method
-    result = post_logic.update(post_id, data.content)
+    result = await services.posts.update(post_id, data.content, caller_id(claims))
     if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
+        raise write_error(result)
     return result
 
 
 @app.delete("/posts/{post_id}")
-def delete_post(post_id: int):
+async def delete_post(post_id: int, claims: dict = Depends(authenticate)):
     # Fixed: Use instance method instead of static method
-    result = post_logic.delete(post_id)
+    result = await services.posts.delete(post_id, caller_id(claims))
     if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
+        raise write_error(result)
     return result
 
 
 # ---------------- COMMENT ENDPOINTS ----------------
 @app.post("/comments")
-def create_comment(data: CommentModel):
+async def create_comment(data: CommentModel, claims: dict = Depends(authenticate)):
+    check_user(claims, data.user_id)
+    if WRITE_BEHIND:
+        if not data.content or not data.content.strip():
+            raise HTTPException(status_code=400, detail="Comment content cannot be empty")
+        return accepted(services.comment_ingest.submit(data.model_dump()))
     # Fixed: Use instance method instead of static method
-    result = comment_logic.create(data.user_id, data.post_id, data.content)
+    result = await services.comments.create(data.user_id, data.post_id, data.content, authenticated=claims is not None)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+@app.post("/comments/batch")
+async def create_comments(data: CommentBatchModel, claims: dict = Depends(authenticate)):
+    check_user(claims, *(comment.user_id for comment in data.comments))
+    result = await services.comments.create_many([comment.model_dump() for comment in data.comments])
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
 
 
 @app.get("/comments/{comment_id}")
-def get_comment(comment_id: int):
+async def get_comment(comment_id: int):
     # Fixed: Use instance method instead of static method
-    result = comment_logic.get(comment_id)
+    result = await services.comments.get(comment_id)
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
     return result
 
 
 @app.get("/comments/post/{post_id}")
-def get_comments_by_post(post_id: int):
-    # Fixed: Use instance method instead of static method
-    result = comment_logic.get_by_post(post_id)
+async def get_comments_by_post(
+    request: Request,
+    post_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    fields: str = None,
+    authors: bool = False,
+):
+    etag = change_counters.etag(("comments", post_id), *(("users",) if authors else ()))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    result = await services.comments.get_page_by_post(post_id, limit, cursor, fields, authors)
     if "error" in result:
-        raise HTTPException(status_code=404, detail=result["error"])
-    return result
+        status_code = 404 if result["error"] == "Post not found" else 400
+        raise HTTPException(status_code=status_code, detail=result["error"])
+    return json_response(request, result, headers=etag_headers(etag))
 
 
 @app.put("/comments/{comment_id}")
-def update_comment(comment_id: int, data: CommentUpdateModel):
+async def update_comment(comment_id: int, data: CommentUpdateModel, claims: dict = Depends(authenticate)):
     # Fixed: Use instance method instead of static method
-    result = comment_logic.update(comment_id, data.content)
+    result = await services.comments.update(comment_id, data.content, caller_id(claims))
     if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
+        raise write_error(result)
     return result
 
 
 @app.delete("/comments/{comment_id}")
-def delete_comment(comment_id: int):
+async def delete_comment(comment_id: int, claims: dict = Depends(authenticate)):
     # Fixed: Use instance method instead of static method
-    result = comment_logic.delete(comment_id)
+    result = await services.comments.delete(comment_id, caller_id(claims))
     if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
+        raise write_error(result)
     return result
 
 
+# ---------------- FEED ENDPOINTS ----------------
+@app.get("/feed")
+async def get_feed(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    comments: int = Query(DEFAULT_FEED_COMMENTS, ge=0, le=MAX_FEED_COMMENTS),
+    fields: str = None,
+    authors: bool = False,
+):
+    # With authors=true the page also changes when a username does
+    etag = change_counters.etag("posts", "comments", *(("users",) if authors else ()))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    result = await services.feed.get_page(limit, cursor, comments, fields, authors)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return json_response(request, result, headers=etag_headers(etag))
+
+
+# ---------------- INGEST ENDPOINTS ----------------
+@app.get("/ingest/{provisional_id}")
+async def get_ingest_status(provisional_id: str):
+    """Where a write-behind item stands: queued, written (with its id), failed or unknown"""
+    queue = services.post_ingest if provisional_id.startswith("post-") else services.comment_ingest
+    status = queue.status(provisional_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired provisional id")
+    return {"provisional_id": provisional_id, **status}
+
+
+# ---------------- EVENT ENDPOINTS ----------------
+@app.get("/events")
+async def stream_events(request: Request):
+    """Server-Sent Events for post and comment writes.
+
+    Event types: post_created, post_updated, post_deleted, comment_created,
+    comment_updated, comment_deleted, user_deleted, and resync when the
+    client must refetch because events were lost.
+    """
+    try:
+        subscription = event_broker.subscribe(request.headers.get("last-event-id"))
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+    async def stream():
+        try:
+            async for chunk in subscription.stream():
+                yield chunk
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: stop nginx-style proxies from holding events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------------- STATS ENDPOINTS ----------------
+@app.get("/stats")
+async def get_stats():
+    return {
+        "cache": DatabaseManager.cache.stats(),
+        "hashing": password_hasher.stats(),
+        "search": search_index.stats(),
+        "events": event_broker.stats(),
+        "auth": session_tokens.stats(),
+        "ratelimit": rate_limiter.stats(),
+        "ingest": {"posts": services.post_ingest.stats(), "comments": services.comment_ingest.stats()},
+        "transport": transport_stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
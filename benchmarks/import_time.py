@@ -0,0 +1,106 @@
+"""Cold-start budget check for the API module.
+
+Imports API/main.py in fresh interpreters, as a uvicorn worker does at boot,
+and reports the wall time of the import plus the share spent in this
+repo's own modules (src.* and main, from `python -X importtime`). Exits
+non-zero when either median exceeds its budget, or when importing created
+a storage backend (which would mean a connection, and credentials, at
+import time), so it can gate CI.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 10 --budget-ms 800 --own-budget-ms 60
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+from src import backends
+print(json.dumps({"seconds": elapsed, "backend_created": backends._backend is not None or backends._async_backend is not None}))
+"""
+
+
+def own_module(name: str):
+    return name == "main" or name == "src" or name.startswith("src.")
+
+
+def measure_once():
+    """One cold import: (wall seconds, own-module seconds, backend created)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=os.path.join(ROOT, "API"), capture_output=True, text=True, check=True,
+    )
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    own_us = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit() and own_module(name.strip()):
+            own_us += int(self_us)
+    return probe["seconds"], own_us / 1e6, probe["backend_created"]
+
+
+def main(args):
+    runs = [measure_once() for _ in range(args.runs)]
+    total_ms = statistics.median(run[0] for run in runs) * 1000
+    own_ms = statistics.median(run[1] for run in runs) * 1000
+    backend_created = any(run[2] for run in runs)
+
+    print(f"import main       median {total_ms:8.1f} ms   budget {args.budget_ms:g} ms")
+    print(f"  own modules     median {own_ms:8.1f} ms   budget {args.own_budget_ms:g} ms")
+    print(f"  backend created at import: {'yes' if backend_created else 'no'}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.1f} ms, over the {args.budget_ms:g} ms budget")
+    if own_ms > args.own_budget_ms:
+        failures.append(f"own modules took {own_ms:.1f} ms, over the {args.own_budget_ms:g} ms budget")
+    if backend_created:
+        failures.append("importing the API created a storage backend")
+
+    report = {
+        "label": args.label,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "median_ms": round(total_ms, 2),
+        "own_median_ms": round(own_ms, 2),
+        "budget_ms": args.budget_ms,
+        "own_budget_ms": args.own_budget_ms,
+        "backend_created": backend_created,
+        "passed": not failures,
+    }
+    if args.output or args.label:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        suffix = f"-{args.label}" if args.label else ""
+        output = args.output or os.path.join(RESULTS_DIR, f"import-time-{datetime.now():%Y%m%d-%H%M%S}{suffix}.json")
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the cold import time of the API module")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Budget for the whole import, dependencies included")
+    parser.add_argument("--own-budget-ms", type=float, default=150, help="Budget for src.* and main themselves")
+    parser.add_argument("--label", default="", help="Tag stored with the results and in the file name")
+    parser.add_argument("--output", help="Path of the JSON results file")
+    sys.exit(main(parser.parse_args()))
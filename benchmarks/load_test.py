@@ -0,0 +1,250 @@
+"""End-to-end load test for the FastAPI app.
+
+Starts the API with uvicorn against a throwaway SQLite database, seeds users,
+posts and comments, then replays a weighted mix of requests from concurrent
+clients. Reports throughput and p50/p95/p99 latency per endpoint and writes
+the results as JSON so runs can be compared over time.
+
+    python benchmarks/load_test.py --concurrency 32 --duration 20
+    python benchmarks/load_test.py --mix feed=1 --concurrency 64
+    python benchmarks/load_test.py --url http://127.0.0.1:8000   # existing server
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+PASSWORD = "benchmark-password"
+
+DEFAULT_MIX = "feed=55,comments=25,create_post=10,login=10"
+
+
+# ---------------- SERVER ----------------
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, db_path: str, workers: int, env_overrides: dict):
+    env = {
+        **os.environ,
+        "DB_BACKEND": "sqlite",
+        "SQLITE_PATH": db_path,
+        **env_overrides,
+    }
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=os.path.join(ROOT, "API"), env=env)
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/stats")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API did not start in time")
+
+
+# ---------------- SEEDING ----------------
+async def seed(client: httpx.AsyncClient, users: int, posts: int, comments: int):
+    """Create the dataset through the public API; returns the ids to replay against"""
+    run_id = random.randrange(1 << 30)
+    user_ids, emails = [], []
+    for i in range(users):
+        email = f"bench{run_id}_{i}@example.com"
+        response = await client.post("/register", json={"username": f"b{run_id % 10**6}_{i}", "email": email, "password": PASSWORD})
+        response.raise_for_status()
+        user_ids.append(response.json()["user_id"])
+        emails.append(email)
+
+    post_ids = []
+    for i in range(posts):
+        response = await client.post("/posts", json={"user_id": random.choice(user_ids), "content": f"Seed post {i} #bench"})
+        response.raise_for_status()
+        post_ids.append(response.json()["post_id"])
+
+    for i in range(comments):
+        response = await client.post("/comments", json={
+            "user_id": random.choice(user_ids),
+            "post_id": random.choice(post_ids),
+            "content": f"Seed comment {i}",
+        })
+        response.raise_for_status()
+
+    return {"user_ids": user_ids, "emails": emails, "post_ids": post_ids}
+
+
+# ---------------- SCENARIOS ----------------
+def build_scenarios(data: dict, page_size: int):
+    async def feed(client):
+        return await client.get("/feed", params={"limit": page_size})
+
+    async def comments(client):
+        return await client.get(f"/comments/post/{random.choice(data['post_ids'])}", params={"limit": page_size})
+
+    async def create_post(client):
+        return await client.post("/posts", json={"user_id": random.choice(data["user_ids"]), "content": "Load test post"})
+
+    async def login(client):
+        return await client.post("/login", json={"email": random.choice(data["emails"]), "password": PASSWORD})
+
+    return {"feed": feed, "comments": comments, "create_post": create_post, "login": login}
+
+
+def parse_mix(mix: str):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+# ---------------- RUNNER ----------------
+async def run_load(client: httpx.AsyncClient, scenarios: dict, weights: dict, concurrency: int, duration: float):
+    names = list(weights)
+    weight_list = [weights[name] for name in names]
+    samples = {name: [] for name in names}
+    statuses = {name: {} for name in names}
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        while time.monotonic() < deadline:
+            name = random.choices(names, weights=weight_list)[0]
+            started = time.perf_counter()
+            try:
+                status = (await scenarios[name](client)).status_code
+            except httpx.HTTPError:
+                status = "transport_error"
+            samples[name].append(time.perf_counter() - started)
+            statuses[name][status] = statuses[name].get(status, 0) + 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, statuses, time.monotonic() - started
+
+
+def percentile(values: list, p: float):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples: dict, statuses: dict, elapsed: float):
+    endpoints = {}
+    for name, latencies in samples.items():
+        ok = sum(count for status, count in statuses[name].items() if isinstance(status, int) and status < 400)
+        endpoints[name] = {
+            "requests": len(latencies),
+            "ok": ok,
+            "errors": len(latencies) - ok,
+            "statuses": {str(status): count for status, count in statuses[name].items()},
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50) * 1000, 2),
+                "p95": round(percentile(latencies, 95) * 1000, 2),
+                "p99": round(percentile(latencies, 99) * 1000, 2),
+                "max": round(max(latencies, default=0) * 1000, 2),
+            },
+        }
+    total = sum(len(latencies) for latencies in samples.values())
+    return {"total_requests": total, "throughput_rps": round(total / elapsed, 2), "elapsed_s": round(elapsed, 2), "endpoints": endpoints}
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<14}{'reqs':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in report["endpoints"].items():
+        latency = row["latency_ms"]
+        print(f"{name:<14}{row['requests']:>8}{row['errors']:>6}{row['throughput_rps']:>10}"
+              f"{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}")
+    print(f"{'total':<14}{report['total_requests']:>8}{'':>6}{report['throughput_rps']:>10}")
+
+
+async def main(args):
+    weights = parse_mix(args.mix)
+    server = None
+    tmpdir = tempfile.mkdtemp(prefix="social-bench-")
+    base_url = args.url
+    if not base_url:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(port, os.path.join(tmpdir, "bench.db"), args.workers, {"BCRYPT_ROUNDS": str(args.bcrypt_rounds)})
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            await wait_until_ready(client)
+            data = await seed(client, args.users, args.posts, args.comments)
+            scenarios = build_scenarios(data, args.page_size)
+            unknown = set(weights) - set(scenarios)
+            if unknown:
+                raise SystemExit(f"Unknown scenario(s) in --mix: {', '.join(sorted(unknown))}")
+            samples, statuses, elapsed = await run_load(client, scenarios, weights, args.concurrency, args.duration)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "label": args.label,
+        "config": {
+            "url": args.url or "local sqlite",
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "mix": weights,
+            "workers": args.workers,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "dataset": {"users": args.users, "posts": args.posts, "comments": args.comments},
+            "page_size": args.page_size,
+        },
+        **summarize(samples, statuses, elapsed),
+    }
+    print_report(report)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    suffix = f"-{args.label}" if args.label else ""
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}{suffix}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Social Media Network API")
+    parser.add_argument("--url", help="Benchmark an already running API instead of starting one")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds of load after seeding")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted scenarios (default: {DEFAULT_MIX})")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--comments", type=int, default=600)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", default="", help="Tag stored with the results and in the file name")
+    parser.add_argument("--output", help="Path of the JSON results file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+"""Serialization benchmark for the list endpoints' response path.
+
+Renders synthetic feed pages the way FastAPI does by default
+(jsonable_encoder + JSONResponse) and through src.serialization's fast
+path, with and without compression. Reports CPU time per response and the
+bytes that would go on the wire, and writes the results as JSON next to the
+load test results.
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --posts 100 --comments 3 --iterations 500
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+sys.path.append(ROOT)
+from src import serialization  # noqa: E402
+
+WORDS = "the quick brown fox jumps over lazy dog #python #fastapi @alice @bob streamlit supabase feed post".split()
+
+
+def make_page(posts: int, comments: int):
+    """A /feed page shaped like the real one: posts with embedded comments"""
+    start = datetime(2024, 1, 1)
+    page = []
+    for i in range(posts):
+        post_comments = [{
+            "id": i * 100 + j,
+            "content": " ".join(random.choices(WORDS, k=random.randint(4, 20))),
+            "date_commented": (start + timedelta(minutes=i * 10 + j)).isoformat(),
+            "user_id": random.randint(1, 500),
+            "post_id": i,
+        } for j in range(comments)]
+        page.append({
+            "id": i,
+            "content": " ".join(random.choices(WORDS, k=random.randint(10, 60))),
+            "date_posted": (start + timedelta(minutes=i * 10)).isoformat(),
+            "user_id": random.randint(1, 500),
+            "comments": post_comments,
+            "comment_count": comments + random.randint(0, 20),
+        })
+    return {"posts": page, "next_cursor": "WyIyMDI0LTAxLTAxVDAwOjAwOjAwIiwxXQ"}
+
+
+class FakeRequest:
+    def __init__(self, accept_encoding: str):
+        self.headers = {"accept-encoding": accept_encoding}
+
+
+def default_path(content, accept_encoding):
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_path(content, accept_encoding):
+    return serialization.json_response(FakeRequest(accept_encoding), content).body
+
+
+VARIANTS = [
+    ("default", default_path, ""),
+    ("fast", fast_path, "identity"),
+    ("fast+gzip", fast_path, "gzip"),
+]
+if serialization.brotli is not None:
+    VARIANTS.append(("fast+br", fast_path, "br"))
+
+
+def measure(render, content, accept_encoding: str, iterations: int):
+    render(content, accept_encoding)  # warm up
+    started = time.process_time()
+    for _ in range(iterations):
+        body = render(content, accept_encoding)
+    cpu = time.process_time() - started
+    return {"cpu_ms_per_response": round(cpu / iterations * 1000, 4), "bytes": len(body)}
+
+
+def main(args):
+    random.seed(args.seed)
+    content = make_page(args.posts, args.comments)
+    results = {}
+    for name, render, accept_encoding in VARIANTS:
+        results[name] = measure(render, content, accept_encoding, args.iterations)
+
+    baseline = results["default"]
+    print(f"encoder: {'orjson' if serialization.orjson else 'json (stdlib)'}, "
+          f"brotli: {'yes' if serialization.brotli else 'not installed'}")
+    print(f"\n{'variant':<12}{'cpu ms':>10}{'bytes':>10}{'cpu x':>8}{'size %':>8}")
+    for name, row in results.items():
+        speedup = baseline["cpu_ms_per_response"] / row["cpu_ms_per_response"] if row["cpu_ms_per_response"] else 0
+        print(f"{name:<12}{row['cpu_ms_per_response']:>10}{row['bytes']:>10}"
+              f"{speedup:>8.2f}{row['bytes'] / baseline['bytes'] * 100:>8.1f}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "label": args.label,
+        "config": {
+            "posts": args.posts,
+            "comments": args.comments,
+            "iterations": args.iterations,
+            "encoder": "orjson" if serialization.orjson else "json",
+            "compress_min_size": serialization.COMPRESS_MIN_SIZE,
+        },
+        "variants": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    suffix = f"-{args.label}" if args.label else ""
+    output = args.output or os.path.join(RESULTS_DIR, f"serialization-{datetime.now():%Y%m%d-%H%M%S}{suffix}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark list response serialization")
+    parser.add_argument("--posts", type=int, default=100, help="Posts per page")
+    parser.add_argument("--comments", type=int, default=3, help="Embedded comments per post")
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="Tag stored with the results and in the file name")
+    parser.add_argument("--output", help="Path of the JSON results file")
+    main(parser.parse_args())
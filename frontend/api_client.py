@@ -0,0 +1,63 @@
+"""HTTP client shared by every Streamlit session.
+
+One pooled requests.Session keeps connections to the API alive between
+calls, GETs are retried on connection errors and 502/503/504, and a bounded
+thread pool runs independent reads (such as the comment lists of every
+visible post) concurrently.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "20"))
+API_RETRIES = int(os.getenv("API_RETRIES", "2"))
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "10"))
+API_FETCH_WORKERS = int(os.getenv("API_FETCH_WORKERS", "8"))
+
+
+class ApiClient:
+    def __init__(self, base_url: str, pool_size: int = API_POOL_SIZE, retries: int = API_RETRIES,
+                 connect_timeout: float = API_CONNECT_TIMEOUT, read_timeout: float = API_READ_TIMEOUT,
+                 fetch_workers: int = API_FETCH_WORKERS):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        # Only idempotent methods are retried (urllib3's default), so a POST never runs twice
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="api-fetch")
+
+    def request(self, method: str, path: str, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, f"{self.base_url}{path}", **kwargs)
+
+    def get(self, path: str, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path: str, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def map(self, func, items):
+        """func(item) for every item, run concurrently on the bounded pool; results in order.
+
+        `func` runs outside the Streamlit script thread, so it must not call st.*.
+        """
+        return list(self._executor.map(func, items))
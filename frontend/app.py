@@ -2,19 +2,50 @@ import streamlit as st
 import requests
 import time
 import os
+from api_client import ApiClient
+from live_feed import FeedStream, apply_event, extend_feed, local_event, new_feed, thread_of
+from read_cache import ReadCache, comments_path
 
 API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+# Posts fetched and rendered per "Load more"
+FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", "10"))
+LIVE_REFRESH = os.getenv("LIVE_REFRESH", "3s")
+# Seconds a fetched list is reused without asking the API
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "10"))
+COMMENTS_CACHE_TTL = float(os.getenv("COMMENTS_CACHE_TTL", "10"))
+USERS_CACHE_TTL = float(os.getenv("USERS_CACHE_TTL", "60"))
 
 st.set_page_config(page_title="Social Media Network", page_icon="🌐")
 st.title("🌐 Social Media Network")
 
+# ---------------- API CLIENT ----------------
+@st.cache_resource
+def get_api_client():
+    """One pooled client for every session of this Streamlit server"""
+    return ApiClient(API_URL)
+
+
+api = get_api_client()
+
 # ---------------- SESSION STATE ----------------
 if "user" not in st.session_state:
     st.session_state.user = None
+# Bearer token from /login, sent with every write
+if "token" not in st.session_state:
+    st.session_state.token = None
+# Recent list reads of this session, see read_cache.py
+if "read_cache" not in st.session_state:
+    st.session_state.read_cache = ReadCache()
 
 # ---------------- HELPER FUNCTIONS ----------------
 def safe_response(response):
     """Safely handle response JSON parsing"""
+    if response.status_code == 401 and st.session_state.token:
+        # Expired or revoked: the user has to log in again
+        st.session_state.user = None
+        st.session_state.token = None
+        return {"error": "Your session has expired, please log in again"}
     try:
         return response.json()
     except Exception as e:
@@ -22,14 +53,49 @@ def safe_response(response):
         return {"error": f"Response parsing error: {response.status_code}"}
 
 
+def auth_headers():
+    token = st.session_state.token
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def conditional_get(path, params, ttl, read_cache=None):
+    """GET a list endpoint through the session's read cache.
+
+    A read younger than `ttl` seconds is returned without a request. An
+    older one is revalidated with If-None-Match, and on 304 its body is
+    reused, so an unchanged feed is neither re-serialized by the API nor
+    downloaded again. Pass the session's `read_cache` explicitly when calling
+    from a worker thread, where st.session_state is not available.
+    """
+    if read_cache is None:
+        read_cache = st.session_state.read_cache
+    key = ReadCache.key(path, params)
+    cached = read_cache.get(key)
+    if cached and cached[0]:
+        return cached[2]
+    headers = {"If-None-Match": cached[1]} if cached else {}
+    response = api.get(path, params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        read_cache.refresh(key, ttl)
+        return cached[2]
+    try:
+        result = response.json()
+    except ValueError:
+        return {"error": f"Response parsing error: {response.status_code}"}
+    etag = response.headers.get("ETag")
+    if response.ok and etag:
+        read_cache.store(key, etag, result, ttl)
+    return result
+
+
 def register(username, email, password):
     """Register a new user"""
     try:
-        response = requests.post(f"{API_URL}/register", json={
+        response = api.post("/register", json={
             "username": username,
             "email": email,
             "password": password
-        }, timeout=10)
+        })
         return safe_response(response)
     except requests.exceptions.RequestException as e:
         return {"error": f"Connection error: {e}"}
@@ -38,22 +104,35 @@ def register(username, email, password):
 def login(email, password):
     """Login user"""
     try:
-        response = requests.post(f"{API_URL}/login", json={
+        response = api.post("/login", json={
             "email": email,
             "password": password
-        }, timeout=10)
+        })
         return safe_response(response)
     except requests.exceptions.RequestException as e:
         return {"error": f"Connection error: {e}"}
 
 
+def logout():
+    """Revoke this session's token and forget the user"""
+    if st.session_state.token:
+        try:
+            api.post("/logout", headers=auth_headers())
+        except requests.exceptions.RequestException:
+            pass  # the token still expires on its own
+    st.session_state.user = None
+    st.session_state.token = None
+
+
 def create_post(user_id, content):
     """Create a new post"""
     try:
-        response = requests.post(f"{API_URL}/posts", json={
+        response = api.post("/posts", json={
             "user_id": user_id,
             "content": content
-        }, timeout=10)
+        }, headers=auth_headers())
+        if response.ok:
+            st.session_state.read_cache.invalidate_feed()
         return safe_response(response)
     except requests.exceptions.RequestException as e:
         return {"error": f"Connection error: {e}"}
@@ -62,7 +141,9 @@ def create_post(user_id, content):
 def update_post(post_id, content):
     """Update existing post"""
     try:
-        response = requests.put(f"{API_URL}/posts/{post_id}", json={"content": content}, timeout=10)
+        response = api.put(f"/posts/{post_id}", json={"content": content}, headers=auth_headers())
+        if response.ok:
+            st.session_state.read_cache.invalidate_feed()
         return safe_response(response)
     except requests.exceptions.RequestException as e:
         return {"error": f"Connection error: {e}"}
@@ -71,57 +152,269 @@ def update_post(post_id, content):
 def delete_post(post_id):
     """Delete a post"""
     try:
-        response = requests.delete(f"{API_URL}/posts/{post_id}", timeout=10)
+        response = api.delete(f"/posts/{post_id}", headers=auth_headers())
+        if response.ok:
+            st.session_state.read_cache.invalidate_post(post_id)
         return safe_response(response)
     except requests.exceptions.RequestException as e:
         return {"error": f"Connection error: {e}"}
 
 
-def get_posts():
-    """Get all posts"""
+def get_feed(limit=FEED_PAGE_SIZE, cursor=None, comments=0):
+    """Get one page of posts with comment counts, as {"posts", "next_cursor"}.
+
+    No comments are embedded by default; threads are fetched when opened.
+    """
     try:
-        response = requests.get(f"{API_URL}/posts", timeout=10)
-        return safe_response(response)
+        params = {"limit": limit, "comments": comments, "authors": "true"}
+        if cursor:
+            params["cursor"] = cursor
+        result = conditional_get("/feed", params, FEED_CACHE_TTL)
+        if isinstance(result, dict) and "posts" in result:
+            return result
+        return {"posts": [], "next_cursor": None}
     except requests.exceptions.RequestException as e:
-        st.error(f"Failed to fetch posts: {e}")
-        return []
+        st.error(f"Failed to fetch feed: {e}")
+        return {"posts": [], "next_cursor": None}
 
 
 def create_comment(user_id, post_id, content):
     """Create a new comment"""
     try:
-        response = requests.post(f"{API_URL}/comments", json={
+        response = api.post("/comments", json={
             "user_id": user_id,
             "post_id": post_id,
             "content": content
-        }, timeout=10)
+        }, headers=auth_headers())
+        if response.ok:
+            st.session_state.read_cache.invalidate_post(post_id)
         return safe_response(response)
     except requests.exceptions.RequestException as e:
         return {"error": f"Connection error: {e}"}
 
 
-def get_comments(post_id):
-    """Get comments for a post"""
+def fetch_comments(post_id, read_cache, limit=PAGE_SIZE):
+    """Comments of one post; safe to run on the client's thread pool (no st.* calls)"""
     try:
-        response = requests.get(f"{API_URL}/comments/post/{post_id}", timeout=10)
-        result = safe_response(response)
-        # Handle both list and dict responses
-        if isinstance(result, list):
-            return result
-        elif isinstance(result, dict) and "error" not in result:
-            return result
-        else:
-            return []
-    except requests.exceptions.RequestException as e:
-        st.error(f"Failed to fetch comments: {e}")
+        result = conditional_get(comments_path(post_id), {"limit": limit, "authors": "true"}, COMMENTS_CACHE_TTL, read_cache)
+    except requests.exceptions.RequestException:
         return []
+    if isinstance(result, dict) and "comments" in result:
+        return result["comments"]
+    return []
+
+
+def get_comments_for(post_ids, limit=PAGE_SIZE):
+    """Comment lists of several posts fetched concurrently, as {post_id: comments}.
+
+    Render time is bounded by the slowest request rather than their sum.
+    """
+    read_cache = st.session_state.read_cache
+    results = api.map(lambda post_id: fetch_comments(post_id, read_cache, limit), post_ids)
+    return dict(zip(post_ids, results))
+
+
+def get_usernames(user_ids):
+    """{user_id: username} for several users in one request"""
+    if not user_ids:
+        return {}
+    try:
+        result = conditional_get("/users", {"ids": ",".join(str(user_id) for user_id in sorted(user_ids))}, USERS_CACHE_TTL)
+    except requests.exceptions.RequestException:
+        return {}
+    if isinstance(result, dict) and "users" in result:
+        return {user["id"]: user["username"] for user in result["users"]}
+    return {}
+
+
+def author_name(row, usernames):
+    return row.get("username") or usernames.get(row["user_id"]) or f"User {row['user_id']}"
+
+
+# ---------------- LIVE FEED ----------------
+def live_feed():
+    """The session's feed with every streamed change applied.
+
+    The first page is fetched once per session and again only when the event
+    stream asks for a resync (or was restarted), which drops any pages loaded
+    since; everything else arrives as deltas from GET /events.
+    """
+    stream = st.session_state.get("feed_stream")
+    if stream is None or not stream.alive:
+        stream = st.session_state.feed_stream = FeedStream(f"{API_URL}/events")
+        st.session_state.feed = None
+    feed = st.session_state.get("feed")
+    events = stream.drain()
+    for event in events:
+        # Cached threads of other sessions' changes are stale too
+        post_id = thread_of(event["event"], event["data"])
+        if post_id is not None:
+            st.session_state.read_cache.invalidate(comments_path(post_id))
+    if feed is None or not all(apply_event(feed, event["event"], event["data"]) for event in events):
+        # Whatever was cached predates the changes the stream could not express
+        st.session_state.read_cache.invalidate_feed()
+        page = get_feed()
+        feed = st.session_state.feed = new_feed(page["posts"], page.get("next_cursor"))
+    return feed
+
+
+def load_more(feed):
+    """Fetch the page after the last loaded one into the feed"""
+    page = get_feed(cursor=feed["next_cursor"])
+    extend_feed(feed, page["posts"], page.get("next_cursor"))
+
+
+def apply_local(event_type, **row):
+    """Apply this session's own write now instead of refetching; the stream's echo is a no-op"""
+    if event_type.endswith("_created") and row.get("id") is None:
+        # Queued by a write-behind API (202, provisional id only); the row
+        # arrives over the event stream once it is written
+        return
+    feed = st.session_state.get("feed")
+    if feed is not None and not apply_event(feed, event_type, local_event(event_type, **row)):
+        st.session_state.feed = None
+
+
+def live_fragment(func):
+    """Re-render `func` every LIVE_REFRESH so streamed changes show up without
+    user input; on Streamlit versions without fragments it renders once per run"""
+    fragment = getattr(st, "fragment", None)
+    return fragment(run_every=LIVE_REFRESH)(func) if fragment else func
+
+
+@live_fragment
+def render_posts():
+    # Display Posts Section
+    st.subheader("All Posts")
+    
+    with st.spinner("Loading posts..."):
+        feed = live_feed()
+        posts = feed["posts"]
+    
+    if not posts:
+        st.info("No posts yet. Be the first to post something!")
+    else:
+        # Only the threads of expanded posts are fetched, side by side
+        threads = get_comments_for([post["id"] for post in posts if st.session_state.get(f"show_comments_{post['id']}")])
+        # Pages carry usernames; posts streamed in from other sessions do not
+        usernames = get_usernames({post["user_id"] for post in posts if not post.get("username")})
+        for post in posts:
+            with st.container():
+                # Post header
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    st.markdown(f"**{author_name(post, usernames)}** • {post['date_posted'][:19]}")
+                with col2:
+                    if post['user_id'] == st.session_state.user["id"]:
+                        st.markdown("*Your post*")
+                
+                # Post content
+                st.markdown(f">{post['content']}")
+                
+                # Post actions (only for post owner)
+                if post['user_id'] == st.session_state.user["id"]:
+                    with st.expander("✏️ Edit/Delete Post"):
+                        new_content = st.text_area(
+                            "Edit content:", 
+                            value=post['content'], 
+                            key=f"edit_{post['id']}",
+                            max_chars=1000
+                        )
+                        
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            if st.button("Update Post", key=f"update_{post['id']}"):
+                                if not new_content.strip():
+                                    st.error("Content cannot be empty!")
+                                else:
+                                    with st.spinner("Updating..."):
+                                        res = update_post(post['id'], new_content)
+                                        if "error" in res:
+                                            st.error(res["error"])
+                                        else:
+                                            apply_local("post_updated", id=post['id'], content=new_content)
+                                            st.session_state.flash = "Post updated!"
+                                            st.rerun()
+                        
+                        with col2:
+                            if st.button("🗑️ Delete Post", key=f"delete_{post['id']}", type="secondary"):
+                                if st.session_state.get(f"confirm_delete_{post['id']}", False):
+                                    with st.spinner("Deleting..."):
+                                        res = delete_post(post['id'])
+                                        if "error" in res:
+                                            st.error(res["error"])
+                                        else:
+                                            apply_local("post_deleted", post_id=post['id'])
+                                            st.session_state.flash = "Post deleted!"
+                                            st.rerun()
+                                else:
+                                    st.session_state[f"confirm_delete_{post['id']}"] = True
+                                    st.warning("Click again to confirm deletion")
+
+                # Comments Section, collapsed until opened
+                comment_count = post.get("comment_count", 0)
+                if post['id'] not in threads:
+                    if st.button(f"💬 Comments ({comment_count})", key=f"show_comments_btn_{post['id']}"):
+                        st.session_state[f"show_comments_{post['id']}"] = True
+                        st.rerun()
+                    st.markdown("---")
+                    continue
+
+                st.markdown("**💬 Comments:**")
+                comments = threads[post['id']]
+                
+                if comments:
+                    for comment in comments:
+                        st.markdown(f"*{author_name(comment, usernames)}*: {comment['content']}")
+                        st.caption(f"Posted on {comment['date_commented'][:19]}")
+                    if comment_count > len(comments):
+                        st.caption(f"Showing the first {len(comments)} of {comment_count} comments")
+                else:
+                    st.markdown("*No comments yet. Be the first to comment!*")
+                if st.button("Hide comments", key=f"hide_comments_btn_{post['id']}"):
+                    st.session_state[f"show_comments_{post['id']}"] = False
+                    st.rerun()
+                
+                # Add Comment Form
+                with st.form(f"comment_form_{post['id']}"):
+                    comment_input = st.text_input(
+                        "Add a comment:", 
+                        key=f"comment_{post['id']}",
+                        max_chars=500
+                    )
+                    submit_comment = st.form_submit_button("💬 Comment")
+                    
+                    if submit_comment:
+                        if not comment_input.strip():
+                            st.error("Comment cannot be empty.")
+                        else:
+                            with st.spinner("Adding comment..."):
+                                res = create_comment(st.session_state.user["id"], post['id'], comment_input)
+                                if "error" in res:
+                                    st.error(res["error"])
+                                else:
+                                    apply_local(
+                                        "comment_created", id=res.get("comment_id"), post_id=post['id'],
+                                        user_id=st.session_state.user["id"], username=st.session_state.user["username"],
+                                        content=comment_input
+                                    )
+                                    st.session_state.flash = "Comment added!"
+                                    st.rerun()
+                
+                st.markdown("---")
+
+        if feed["next_cursor"]:
+            if st.button("Load more", key="load_more"):
+                with st.spinner("Loading more posts..."):
+                    load_more(feed)
+                st.rerun()
 
 
 # ---------------- SIDEBAR ----------------
 if st.session_state.user:
     st.sidebar.success(f"Logged in as: {st.session_state.user['username']}")
     if st.sidebar.button("Logout"):
-        st.session_state.user = None
+        logout()
         st.rerun()
 
 menu = ["Register", "Login", "Posts"] if not st.session_state.user else ["Posts", "Profile"]
@@ -178,6 +471,7 @@ elif choice == "Login" and not st.session_state.user:
                         st.error(result["error"])
                     elif "user" in result:
                         st.session_state.user = result["user"]
+                        st.session_state.token = result.get("access_token")
                         st.success("Logged in successfully!")
                         time.sleep(1)
                         st.rerun()
@@ -192,6 +486,10 @@ elif choice == "Posts":
         st.warning("Please login to view or create posts.")
         st.info("Use the sidebar to navigate to Register or Login.")
     else:
+        flash = st.session_state.pop("flash", None)
+        if flash:
+            st.success(flash)
+
         # Create Post Section
         st.subheader("Create a Post")
         with st.form("create_post_form"):
@@ -207,110 +505,16 @@ elif choice == "Posts":
                         if "error" in res:
                             st.error(res["error"])
                         else:
-                            st.success("Post created successfully!")
-                            time.sleep(1)
+                            apply_local(
+                                "post_created", id=res.get("post_id"), user_id=st.session_state.user["id"],
+                                username=st.session_state.user["username"], content=post_content
+                            )
+                            st.session_state.flash = "Post created successfully!"
                             st.rerun()
 
         st.markdown("---")
         
-        # Display Posts Section
-        st.subheader("All Posts")
-        
-        with st.spinner("Loading posts..."):
-            posts = get_posts()
-        
-        if not posts or (isinstance(posts, dict) and "error" in posts):
-            st.info("No posts yet. Be the first to post something!")
-        else:
-            for i, post in enumerate(posts):
-                with st.container():
-                    # Post header
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.markdown(f"**User {post['user_id']}** • {post['date_posted'][:19]}")
-                    with col2:
-                        if post['user_id'] == st.session_state.user["id"]:
-                            st.markdown("*Your post*")
-                    
-                    # Post content
-                    st.markdown(f">{post['content']}")
-                    
-                    # Post actions (only for post owner)
-                    if post['user_id'] == st.session_state.user["id"]:
-                        with st.expander("✏️ Edit/Delete Post"):
-                            new_content = st.text_area(
-                                "Edit content:", 
-                                value=post['content'], 
-                                key=f"edit_{post['id']}_{i}",
-                                max_chars=1000
-                            )
-                            
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                if st.button("Update Post", key=f"update_{post['id']}_{i}"):
-                                    if not new_content.strip():
-                                        st.error("Content cannot be empty!")
-                                    else:
-                                        with st.spinner("Updating..."):
-                                            res = update_post(post['id'], new_content)
-                                            if "error" in res:
-                                                st.error(res["error"])
-                                            else:
-                                                st.success("Post updated!")
-                                                time.sleep(1)
-                                                st.rerun()
-                            
-                            with col2:
-                                if st.button("🗑️ Delete Post", key=f"delete_{post['id']}_{i}", type="secondary"):
-                                    if st.session_state.get(f"confirm_delete_{post['id']}", False):
-                                        with st.spinner("Deleting..."):
-                                            res = delete_post(post['id'])
-                                            if "error" in res:
-                                                st.error(res["error"])
-                                            else:
-                                                st.success("Post deleted!")
-                                                time.sleep(1)
-                                                st.rerun()
-                                    else:
-                                        st.session_state[f"confirm_delete_{post['id']}"] = True
-                                        st.warning("Click again to confirm deletion")
-
-                    # Comments Section
-                    st.markdown("**💬 Comments:**")
-                    
-                    # Load comments
-                    comments = get_comments(post['id'])
-                    
-                    if comments and isinstance(comments, list) and len(comments) > 0:
-                        for comment in comments:
-                            st.markdown(f"*User {comment['user_id']}*: {comment['content']}")
-                            st.caption(f"Posted on {comment['date_commented'][:19]}")
-                    else:
-                        st.markdown("*No comments yet. Be the first to comment!*")
-                    
-                    # Add Comment Form
-                    with st.form(f"comment_form_{post['id']}_{i}"):
-                        comment_input = st.text_input(
-                            "Add a comment:", 
-                            key=f"comment_{post['id']}_{i}",
-                            max_chars=500
-                        )
-                        submit_comment = st.form_submit_button("💬 Comment")
-                        
-                        if submit_comment:
-                            if not comment_input.strip():
-                                st.error("Comment cannot be empty.")
-                            else:
-                                with st.spinner("Adding comment..."):
-                                    res = create_comment(st.session_state.user["id"], post['id'], comment_input)
-                                    if "error" in res:
-                                        st.error(res["error"])
-                                    else:
-                                        st.success("Comment added!")
-                                        time.sleep(1)
-                                        st.rerun()
-                    
-                    st.markdown("---")
+        render_posts()
 
 
 # ---------------- PROFILE ----------------
@@ -337,7 +541,7 @@ elif choice == "Profile":
         st.markdown("### Account Actions")
         
         if st.button("🚪 Logout", type="secondary"):
-            st.session_state.user = None
+            logout()
             st.success("Logged out successfully!")
             time.sleep(1)
             st.rerun()
@@ -0,0 +1,215 @@
+"""Live feed for the Streamlit app.
+
+FeedStream follows the API's GET /events stream in a background thread and
+buffers what arrives; apply_event folds each event into the session's copy
+of the feed, so a rerun renders changes without refetching every post and
+comment list.
+"""
+import json
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+# A stream nobody has drained for this long belongs to a closed browser tab
+IDLE_TIMEOUT = 300
+MAX_BUFFERED = 1000
+
+
+def parse_sse(lines):
+    """Yield {"event", "data", "id"} dicts from text/event-stream lines"""
+    event = {"event": "message", "data": [], "id": None}
+    for line in lines:
+        if line is None:
+            continue
+        if line == "":
+            if event["data"]:
+                try:
+                    data = json.loads("\n".join(event["data"]))
+                except ValueError:
+                    data = None
+                yield {"event": event["event"], "data": data, "id": event["id"]}
+            event = {"event": "message", "data": [], "id": None}
+        elif line.startswith(":"):
+            continue  # keep-alive comment
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event["event"] = value
+            elif field == "data":
+                event["data"].append(value)
+            elif field == "id":
+                event["id"] = value
+
+
+class FeedStream:
+    """Background reader of GET /events that reconnects with Last-Event-ID"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.last_event_id = None
+        self.connected = False
+        self._events = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_drained = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            headers = {"Accept": "text/event-stream"}
+            if self.last_event_id:
+                headers["Last-Event-ID"] = self.last_event_id
+            try:
+                # The server sends a keep-alive well inside the read timeout
+                with requests.get(self.url, headers=headers, stream=True, timeout=(5, 60)) as response:
+                    response.raise_for_status()
+                    self.connected = True
+                    backoff = 1
+                    for event in parse_sse(self._lines(response)):
+                        self._buffer(event)
+                    if self._stop.is_set():
+                        return
+            except requests.exceptions.RequestException:
+                pass
+            finally:
+                self.connected = False
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _lines(self, response):
+        """Lines of the stream until close() or the idle timeout; checked on
+        every line, keep-alives included, so a quiet stream still ends"""
+        for line in response.iter_lines(decode_unicode=True):
+            if self._stop.is_set() or time.monotonic() - self._last_drained > IDLE_TIMEOUT:
+                self._stop.set()
+                return
+            yield line
+
+    def _buffer(self, event: dict):
+        if event["id"]:
+            self.last_event_id = event["id"]
+        with self._lock:
+            if len(self._events) >= MAX_BUFFERED:
+                # Too far behind to replay; start over from a fresh fetch
+                self._events = [{"event": "resync", "data": {"reason": "client buffer full"}, "id": None}]
+            else:
+                self._events.append(event)
+
+    def drain(self):
+        """Events received since the last call"""
+        self._last_drained = time.monotonic()
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+    def close(self):
+        self._stop.set()
+
+
+# ---------------- FEED STATE ----------------
+def new_feed(posts: list, next_cursor: str = None):
+    """Session copy of the feed's loaded pages; `applied` remembers creations
+    and deletions already counted, so a local update and its echo from the
+    stream apply once"""
+    return {"posts": posts, "next_cursor": next_cursor, "applied": set()}
+
+
+def extend_feed(feed: dict, posts: list, next_cursor: str = None):
+    """Append the next page; keyset cursors make it continue where the last
+    page ended even when posts were created above it in the meantime"""
+    loaded = {post["id"] for post in feed["posts"]}
+    feed["posts"].extend(post for post in posts if post["id"] not in loaded)
+    _sort(feed["posts"])
+    feed["next_cursor"] = next_cursor
+
+
+def _find(posts: list, post_id: int):
+    for post in posts:
+        if post["id"] == post_id:
+            return post
+    return None
+
+
+def _sort(posts: list):
+    posts.sort(key=lambda post: (post["date_posted"], post["id"]), reverse=True)
+
+
+def apply_event(feed: dict, event_type: str, data: dict):
+    """Fold one event into the feed; returns False when the feed must be refetched"""
+    posts = feed["posts"]
+    if event_type in ("resync", "user_deleted") or data is None:
+        # user_deleted cascades to comments the feed may not hold
+        return False
+
+    if event_type in ("post_created", "post_updated"):
+        row = data["post"]
+        post = _find(posts, row["id"])
+        if post is None:
+            if event_type == "post_updated" or ("post_deleted", row["id"]) in feed["applied"]:
+                return True  # not on the loaded page, or an echo arriving after the delete
+            post = {"comments": [], "comment_count": 0}
+            posts.append(post)
+        post.update(row)
+        _sort(posts)
+
+    elif event_type == "post_deleted":
+        feed["posts"] = [post for post in posts if post["id"] != data["post_id"]]
+        feed["applied"].add(("post_deleted", data["post_id"]))
+
+    elif event_type in ("comment_created", "comment_updated"):
+        row = data["comment"]
+        post = _find(posts, row["post_id"])
+        if post is None:
+            return True
+        for comment in post["comments"]:
+            if comment["id"] == row["id"]:
+                comment.update(row)
+                break
+        else:
+            if event_type == "comment_created" and ("comment_created", row["id"]) not in feed["applied"]:
+                # Only extend the list when the whole thread is shown
+                if len(post["comments"]) >= post["comment_count"]:
+                    post["comments"].append(row)
+                post["comment_count"] += 1
+                feed["applied"].add(("comment_created", row["id"]))
+
+    elif event_type == "comment_deleted":
+        post = _find(posts, data["post_id"])
+        key = ("comment_deleted", data["comment_id"])
+        if post is not None and key not in feed["applied"]:
+            post["comments"] = [comment for comment in post["comments"] if comment["id"] != data["comment_id"]]
+            post["comment_count"] = max(0, post["comment_count"] - 1)
+        feed["applied"].add(key)
+
+    return True
+
+
+def thread_of(event_type: str, data: dict):
+    """Id of the post whose comment thread an event changes, if any"""
+    if data is None:
+        return None
+    if event_type in ("comment_created", "comment_updated"):
+        return data["comment"]["post_id"]
+    if event_type in ("comment_deleted", "post_deleted"):
+        return data["post_id"]
+    return None
+
+
+def local_event(event_type: str, **row):
+    """Event for a write this session just made, applied before the stream echoes it"""
+    now = datetime.now().isoformat()
+    if event_type in ("post_created", "post_updated"):
+        # The API stamps updates with the current time as well
+        return {"post": {"date_posted": now, **row}}
+    if event_type == "comment_created":
+        return {"comment": {"date_commented": now, **row}}
+    return row
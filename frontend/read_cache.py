@@ -0,0 +1,70 @@
+"""Per-session cache of list reads for the Streamlit app.
+
+Every widget interaction reruns the whole script. Reads younger than their
+TTL are served from here without touching the network. Older ones are
+revalidated with If-None-Match, so an unchanged list costs one 304. Writes
+made by this session mark exactly the lists they affect as stale.
+"""
+import threading
+import time
+
+FEED_PATHS = ("/feed", "/posts")
+
+
+def comments_path(post_id: int):
+    return f"/comments/post/{post_id}"
+
+
+class ReadCache:
+    """(path, params) -> ETag, body and expiry of a successful list fetch.
+
+    Thread-safe, so the comment fetches running on the client's thread pool
+    can share the session's instance.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path: str, params: dict):
+        return (path, tuple(sorted(params.items())))
+
+    def get(self, key):
+        """(fresh, etag, body) for a key, or None if it was never fetched"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, etag, body = entry
+        return (time.monotonic() < expires, etag, body)
+
+    def store(self, key, etag: str, body, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, etag, body)
+
+    def refresh(self, key, ttl: float):
+        """Start a new TTL for an entry the API just confirmed with a 304"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (time.monotonic() + ttl, entry[1], entry[2])
+
+    def invalidate(self, *paths: str):
+        """Mark every cached read of `paths` stale. The ETag is kept: the next
+        read revalidates, and the API answers with the changed list."""
+        with self._lock:
+            for key, (expires, etag, body) in self._entries.items():
+                if key[0] in paths:
+                    self._entries[key] = (0, etag, body)
+
+    def invalidate_feed(self):
+        self.invalidate(*FEED_PATHS)
+
+    def invalidate_post(self, post_id: int):
+        """A post's comment thread plus the feed pages embedding it"""
+        self.invalidate(comments_path(post_id), *FEED_PATHS)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,369 @@
+from datetime import datetime
+from .metrics import instrument_methods
+from .cache import MISSING
+from .backends import get_async_backend, ForeignKeyViolation
+from .db import DatabaseManager, WriteResult, CACHE_TTLS, USER_PUBLIC_COLUMNS, AUTHOR_COLUMNS, project, POSTS_NEWEST_FIRST, COMMENTS_OLDEST_FIRST
+
+
+@instrument_methods
+class AsyncDatabaseManager:
+    """asyncio counterpart of DatabaseManager.
+
+    Shares DatabaseManager's cache and invalidation rules, so sync scripts
+    and the async API see the same cached rows.
+    """
+
+    # ---------------- USERS ----------------
+    @staticmethod
+    async def create_user(username: str, email: str, password: str):
+        """Insert a new user"""
+        try:
+            result = WriteResult(await get_async_backend().insert("user", [{
+                "username": username,
+                "email": email,
+                "password": password
+            }]))
+            DatabaseManager.cache.delete(("user_email", email))
+            return result
+        except Exception as e:
+            print(f"Database error in create_user: {e}")
+            raise
+
+    @staticmethod
+    async def get_user_by_id(user_id: int, columns="*"):
+        """Get a user by ID"""
+        cached = DatabaseManager.cache.get(("user", user_id))
+        if cached is not MISSING:
+            return project(cached, columns)
+        try:
+            # Always the whole row, so narrow lookups such as existence checks fill the cache too
+            rows = await get_async_backend().select("user", "*", filters={"id": user_id})
+            user = rows[0] if rows else None
+            if user:
+                DatabaseManager.cache.set(("user", user_id), user, CACHE_TTLS["user"])
+            return project(user, columns)
+        except Exception as e:
+            print(f"Database error in get_user_by_id: {e}")
+            return None
+
+    @staticmethod
+    async def get_user_by_email(email: str, columns="*"):
+        """Get a user by email"""
+        cached = DatabaseManager.cache.get(("user_email", email))
+        if cached is not MISSING:
+            return project(cached, columns)
+        try:
+            # Always the whole row, so narrow lookups such as existence checks fill the cache too
+            rows = await get_async_backend().select("user", "*", filters={"email": email})
+            user = rows[0] if rows else None
+            if user:
+                DatabaseManager.cache.set(("user_email", email), user, CACHE_TTLS["user"])
+            return project(user, columns)
+        except Exception as e:
+            print(f"Database error in get_user_by_email: {e}")
+            return None
+
+    @staticmethod
+    async def get_users_by_ids(user_ids: list, columns=USER_PUBLIC_COLUMNS):
+        """Get several users in one query, without their password hashes by default"""
+        if not user_ids:
+            return []
+        try:
+            return await get_async_backend().select("user", columns, in_filter=("id", list(user_ids)))
+        except Exception as e:
+            print(f"Database error in get_users_by_ids: {e}")
+            raise
+
+    @staticmethod
+    async def get_authors(user_ids):
+        """Public profiles of several users as {user_id: {"id", "username"}}.
+
+        Read through the cache one author at a time; every miss is fetched in
+        a single `in_` query. Unknown ids are left out.
+        """
+        cache = DatabaseManager.cache
+        authors = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            cached = cache.get(("author", user_id))
+            if cached is MISSING:
+                missing.append(user_id)
+            else:
+                authors[user_id] = cached
+        if not missing:
+            return authors
+        try:
+            rows = await get_async_backend().select("user", AUTHOR_COLUMNS, in_filter=("id", missing))
+        except Exception as e:
+            print(f"Database error in get_authors: {e}")
+            raise
+        for row in rows:
+            authors[row["id"]] = row
+            cache.set(("author", row["id"]), row, CACHE_TTLS["author"])
+        return authors
+
+    @staticmethod
+    async def update_user(user_id: int, username: str = None, email: str = None, password: str = None):
+        """Update user info"""
+        try:
+            data = {}
+            if username:
+                data["username"] = username
+            if email:
+                data["email"] = email
+            if password:
+                data["password"] = password
+
+            if not data:
+                return {"error": "No data to update"}
+
+            result = WriteResult(await get_async_backend().update("user", data, user_id))
+            DatabaseManager._invalidate_user(user_id)
+            return result
+        except Exception as e:
+            print(f"Database error in update_user: {e}")
+            raise
+
+    @staticmethod
+    async def delete_user(user_id: int):
+        """Delete a user"""
+        try:
+            result = WriteResult(await get_async_backend().delete("user", user_id))
+            DatabaseManager._invalidate_user(user_id)
+            # Posts and comments cascade with the user
+            DatabaseManager.cache.delete_where(lambda key, value: key[0] in ("post", "comments"))
+            return result
+        except Exception as e:
+            print(f"Database error in delete_user: {e}")
+            raise
+
+    # ---------------- POSTS ----------------
+    @staticmethod
+    async def create_post(user_id: int, content: str):
+        """Insert a new post"""
+        try:
+            return WriteResult(await get_async_backend().insert("post", [{
+                "user_id": user_id,
+                "content": content,
+                "date_posted": datetime.now().isoformat()
+            }]))
+        except ForeignKeyViolation:
+            raise
+        except Exception as e:
+            print(f"Database error in create_post: {e}")
+            raise
+
+    @staticmethod
+    async def create_posts(posts: list):
+        """Insert several posts ({"user_id", "content"} dicts) in one multi-row insert"""
+        now = datetime.now().isoformat()
+        try:
+            return WriteResult(await get_async_backend().insert("post", [
+                {"user_id": post["user_id"], "content": post["content"], "date_posted": now} for post in posts
+            ]))
+        except ForeignKeyViolation:
+            raise
+        except Exception as e:
+            print(f"Database error in create_posts: {e}")
+            raise
+
+    @staticmethod
+    async def get_post_by_id(post_id: int, columns="*"):
+        """Get a post by ID"""
+        cached = DatabaseManager.cache.get(("post", post_id))
+        if cached is not MISSING:
+            return project(cached, columns)
+        try:
+            # Always the whole row, so narrow lookups such as existence checks fill the cache too
+            rows = await get_async_backend().select("post", "*", filters={"id": post_id})
+            post = rows[0] if rows else None
+            if post:
+                DatabaseManager.cache.set(("post", post_id), post, CACHE_TTLS["post"])
+            return project(post, columns)
+        except Exception as e:
+            print(f"Database error in get_post_by_id: {e}")
+            return None
+
+    @staticmethod
+    async def get_posts_by_ids(post_ids: list, columns="*"):
+        """Get several posts in one query"""
+        if not post_ids:
+            return []
+        try:
+            return await get_async_backend().select("post", columns, in_filter=("id", list(post_ids)))
+        except Exception as e:
+            print(f"Database error in get_posts_by_ids: {e}")
+            raise
+
+    @staticmethod
+    async def get_all_posts(columns="*"):
+        """Get all posts ordered by date (newest first)"""
+        try:
+            return await get_async_backend().select("post", columns, order=POSTS_NEWEST_FIRST)
+        except Exception as e:
+            print(f"Database error in get_all_posts: {e}")
+            return []
+
+    @staticmethod
+    async def get_posts_page(limit: int, after: tuple = None, columns="*"):
+        """Get up to `limit` posts ordered newest first, starting after the
+        (date_posted, id) keyset `after`"""
+        try:
+            return await get_async_backend().select("post", columns, order=POSTS_NEWEST_FIRST, limit=limit, after=after)
+        except Exception as e:
+            print(f"Database error in get_posts_page: {e}")
+            return []
+
+    @staticmethod
+    async def update_post(post_id: int, content: str):
+        """Update post content"""
+        try:
+            result = WriteResult(await get_async_backend().update("post", {
+                "content": content,
+                "date_posted": datetime.now().isoformat()  # Update timestamp
+            }, post_id))
+            DatabaseManager.cache.delete(("post", post_id))
+            return result
+        except Exception as e:
+            print(f"Database error in update_post: {e}")
+            raise
+
+    @staticmethod
+    async def delete_post(post_id: int):
+        """Delete a post"""
+        try:
+            result = WriteResult(await get_async_backend().delete("post", post_id))
+            DatabaseManager.cache.delete(("post", post_id))
+            DatabaseManager._invalidate_comments(post_id=post_id)
+            return result
+        except Exception as e:
+            print(f"Database error in delete_post: {e}")
+            raise
+
+    # ---------------- COMMENTS ----------------
+    @staticmethod
+    async def create_comment(user_id: int, post_id: int, content: str):
+        """Insert a new comment"""
+        try:
+            result = WriteResult(await get_async_backend().insert("comment", [{
+                "user_id": user_id,
+                "post_id": post_id,
+                "content": content,
+                "date_commented": datetime.now().isoformat()
+            }]))
+            DatabaseManager._invalidate_comments(post_id=post_id)
+            return result
+        except ForeignKeyViolation:
+            raise
+        except Exception as e:
+            print(f"Database error in create_comment: {e}")
+            raise
+
+    @staticmethod
+    async def create_comments(comments: list):
+        """Insert several comments ({"user_id", "post_id", "content"} dicts) in one multi-row insert"""
+        now = datetime.now().isoformat()
+        try:
+            result = WriteResult(await get_async_backend().insert("comment", [
+                {"user_id": comment["user_id"], "post_id": comment["post_id"], "content": comment["content"], "date_commented": now}
+                for comment in comments
+            ]))
+            post_ids = {comment["post_id"] for comment in comments}
+            DatabaseManager.cache.delete_where(lambda key, value: key[0] == "comments" and key[1] in post_ids)
+            return result
+        except ForeignKeyViolation:
+            raise
+        except Exception as e:
+            print(f"Database error in create_comments: {e}")
+            raise
+
+    @staticmethod
+    async def get_comment_by_id(comment_id: int, columns="*"):
+        """Get a comment by ID"""
+        try:
+            rows = await get_async_backend().select("comment", columns, filters={"id": comment_id})
+            return rows[0] if rows else None
+        except Exception as e:
+            print(f"Database error in get_comment_by_id: {e}")
+            return None
+
+    @staticmethod
+    async def get_comments_by_post(post_id: int, columns="*"):
+        """Get all comments for a post ordered by date"""
+        cached = DatabaseManager.cache.get(("comments", post_id))
+        if cached is not MISSING:
+            return project(cached, columns)
+        try:
+            comments = await get_async_backend().select("comment", columns, filters={"post_id": post_id}, order=COMMENTS_OLDEST_FIRST)
+            if columns == "*":
+                DatabaseManager.cache.set(("comments", post_id), comments, CACHE_TTLS["comments"])
+            return comments
+        except Exception as e:
+            print(f"Database error in get_comments_by_post: {e}")
+            return []
+
+    @staticmethod
+    async def get_comments_page(post_id: int, limit: int, after: tuple = None, columns="*"):
+        """Get up to `limit` comments for a post ordered oldest first, starting
+        after the (date_commented, id) keyset `after`"""
+        key = ("comments", post_id, limit, after)
+        cached = DatabaseManager.cache.get(key)
+        if cached is not MISSING:
+            return project(cached, columns)
+        try:
+            comments = await get_async_backend().select(
+                "comment", columns, filters={"post_id": post_id}, order=COMMENTS_OLDEST_FIRST, limit=limit, after=after
+            )
+            if columns == "*":
+                DatabaseManager.cache.set(key, comments, CACHE_TTLS["comments"])
+            return comments
+        except Exception as e:
+            print(f"Database error in get_comments_page: {e}")
+            return []
+
+    @staticmethod
+    async def get_comment_counts(post_ids: list):
+        """Number of comments on each of several posts, as {post_id: count}, in one query"""
+        if not post_ids:
+            return {}
+        try:
+            return await get_async_backend().count_by("comment", "post_id", post_ids)
+        except Exception as e:
+            print(f"Database error in get_comment_counts: {e}")
+            return {}
+
+    @staticmethod
+    async def get_first_comments(post_ids: list, per_post: int, columns="*"):
+        """The oldest `per_post` comments of each of several posts, in one query"""
+        if not post_ids or per_post < 1:
+            return []
+        try:
+            return await get_async_backend().select_first("comment", "post_id", post_ids, per_post, columns, COMMENTS_OLDEST_FIRST)
+        except Exception as e:
+            print(f"Database error in get_first_comments: {e}")
+            return []
+
+    @staticmethod
+    async def update_comment(comment_id: int, content: str):
+        """Update comment content"""
+        try:
+            result = WriteResult(await get_async_backend().update("comment", {
+                "content": content,
+                "date_commented": datetime.now().isoformat()  # Update timestamp
+            }, comment_id))
+            DatabaseManager._invalidate_comments(comment_id=comment_id, result=result)
+            return result
+        except Exception as e:
+            print(f"Database error in update_comment: {e}")
+            raise
+
+    @staticmethod
+    async def delete_comment(comment_id: int):
+        """Delete a comment"""
+        try:
+            result = WriteResult(await get_async_backend().delete("comment", comment_id))
+            DatabaseManager._invalidate_comments(comment_id=comment_id, result=result)
+            return result
+        except Exception as e:
+            print(f"Database error in delete_comment: {e}")
+            raise
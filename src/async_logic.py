@@ -0,0 +1,525 @@
+# src/async_logic.py
+import asyncio
+from .async_db import AsyncDatabaseManager
+from .db import ForeignKeyViolation, ID_ONLY, project
+from .hashing import password_hasher, HasherBusyError
+from .versions import change_counters
+from .search import search_index, extract_tags
+from .events import event_broker
+from .auth import session_tokens
+from .logic import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    DEFAULT_FEED_COMMENTS,
+    MAX_FEED_COMMENTS,
+    WRITE_MODE,
+    FOREIGN_KEY_ERRORS,
+    OWNER_COLUMNS,
+    check_owner,
+    parse_page_request,
+    build_page,
+    assemble_feed,
+    parse_fields,
+    with_columns,
+    POST_KEYSET,
+    COMMENT_KEYSET,
+    start_batch,
+    reject_missing,
+    record_batch_writes,
+    record_batch_error,
+    finish_batch,
+    record_comment_change,
+    parse_ids,
+    with_authors,
+    feed_author_ids,
+    embed_feed_authors,
+)
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+_background_tasks = set()
+
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def apaginate(fetch, limit: int, cursor: str, timestamp_field: str):
+    """Async version of logic.paginate for `async def fetch(limit, after)`"""
+    request = parse_page_request(limit, cursor)
+    if "error" in request:
+        return request
+    rows = await fetch(request["limit"] + 1, request["after"])
+    return build_page(rows, request["limit"], timestamp_field)
+
+
+# ---------------- USER LOGIC ----------------
+class AsyncUserLogic:
+    def __init__(self):
+        self.db = AsyncDatabaseManager()
+
+    async def register(self, username: str, email: str, password: str):
+        if not username or not email or not password:
+            return {"error": "Username, email, and password are required"}
+
+        if await self.db.get_user_by_email(email, ID_ONLY):
+            return {"error": "Email already exists"}
+
+        hashed_pw = await password_hasher.ahash(password)
+        result = await self.db.create_user(username, email, hashed_pw)
+
+        if hasattr(result, 'error') and result.error:
+            return {"error": str(result.error)}
+
+        if result.data:
+            change_counters.bump("users")
+            return {"message": "User registered successfully", "user_id": result.data[0]["id"]}
+        else:
+            return {"error": "Failed to create user"}
+
+    async def login(self, email: str, password: str):
+        if not email or not password:
+            return {"error": "Email and password are required"}
+
+        user = await self.db.get_user_by_email(email)
+        if not user:
+            return {"error": "User not found"}
+
+        try:
+            if await password_hasher.acheck(password, user['password']):
+                if password_hasher.needs_rehash(user['password']):
+                    run_in_background(self._rehash(user["id"], password))
+                user_safe = user.copy()
+                user_safe.pop("password", None)  # Remove password from response
+                return {"message": "Login successful", "user": user_safe, **session_tokens.issue(user_safe)}
+            else:
+                return {"error": "Incorrect password"}
+        except HasherBusyError:
+            raise
+        except Exception as e:
+            print(f"Login error: {e}")
+            return {"error": "Login failed due to server error"}
+
+    async def get_many(self, ids: str):
+        """Public profiles for a comma separated id list, in the order asked for;
+        unknown ids are left out"""
+        parsed = parse_ids(ids)
+        if "error" in parsed:
+            return parsed
+        authors = await self.db.get_authors(parsed["ids"])
+        return {"users": [authors[user_id] for user_id in parsed["ids"] if user_id in authors]}
+
+    async def _rehash(self, user_id: int, password: str):
+        """Re-hash a just-verified password at the current bcrypt cost"""
+        try:
+            await self.db.update_user(user_id, password=await password_hasher.ahash(password))
+        except Exception as e:
+            # Best effort: the old hash stays valid, the next login tries again
+            print(f"Rehash error for user {user_id}: {e}")
+
+    async def update(self, user_id: int, username: str = None, email: str = None, password: str = None):
+        user = await self.db.get_user_by_id(user_id, ID_ONLY)
+        if not user:
+            return {"error": "User not found"}
+
+        update_data = {}
+        if username:
+            update_data["username"] = username
+        if email:
+            existing = await self.db.get_user_by_email(email, ID_ONLY)
+            if existing and existing["id"] != user_id:
+                return {"error": "Email already in use"}
+            update_data["email"] = email
+        if password:
+            update_data["password"] = await password_hasher.ahash(password)
+
+        if not update_data:
+            return {"error": "No data provided to update"}
+
+        result = await self.db.update_user(user_id, **update_data)
+
+        if hasattr(result, 'error') and result.error:
+            return {"error": str(result.error)}
+
+        if username:
+            # Pages with embedded usernames change with it
+            change_counters.bump("users")
+        if password:
+            session_tokens.revoke_user(user_id)
+        return {"message": "User updated successfully"}
+
+    async def delete(self, user_id: int):
+        if not await self.db.get_user_by_id(user_id, ID_ONLY):
+            return {"error": "User not found"}
+
+        result = await self.db.delete_user(user_id)
+
+        if hasattr(result, 'error') and result.error:
+            return {"error": str(result.error)}
+
+        # Posts and comments cascade with the user
+        change_counters.bump_all()
+        session_tokens.revoke_user(user_id)
+        event_broker.publish("user_deleted", {"user_id": user_id})
+        return {"message": "User deleted successfully"}
+
+
+# ---------------- POST LOGIC ----------------
+class AsyncPostLogic:
+    def __init__(self, write_mode: str = WRITE_MODE):
+        self.db = AsyncDatabaseManager()
+        # "direct" skips the existence reads and trusts the write result instead
+        self.direct_writes = write_mode == "direct"
+
+    async def create(self, user_id: int, content: str, authenticated: bool = False):
+        """`authenticated`: user_id comes from a verified session token, so it
+        is not looked up again"""
+        if not content or not content.strip():
+            return {"error": "Post content cannot be empty"}
+        if not self.direct_writes and not authenticated and not await self.db.get_user_by_id(user_id, ID_ONLY):
+            return {"error": "User not found"}
+
+        try:
+            result = await self.db.create_post(user_id, content)
+        except ForeignKeyViolation as e:
+            return {"error": FOREIGN_KEY_ERRORS.get(e.column, "Invalid reference")}
+
+        if hasattr(result, 'error') and result.error:
+            return {"error": str(result.error)}
+
+        if result.data:
+            change_counters.bump("posts")
+            search_index.add(result.data[0]["id"], content)
+            event_broker.publish("post_created", {"post": result.data[0]})
+            return {"message": "Post created successfully", "post_id": result.data[0]["id"]}
+        else:
+            return {"error": "Failed to create post"}
+
+    async def create_many(self, items: list):
+        """Create posts from {"user_id", "content"} dicts.
+
+        Every author is checked with one `in_` query and every valid post is
+        written with one multi-row insert; results follow the input order.
+        """
+        batch = start_batch(items, "Post content cannot be empty")
+        if "error" in batch:
+            return batch
+        results, pending = batch["results"], batch["pending"]
+
+        pending = await self._check_references(items, results, pending)
+        while pending:
+            try:
+                result = await self.db.create_posts([items[i] for i in pending])
+            except ForeignKeyViolation as e:
+                # A user was deleted after the check and the insert is all-or-nothing:
+                # fail only the posts that lost their author and write the rest again
+                remaining = await self._check_references(items, results, pending)
+                if len(remaining) == len(pending):
+                    record_batch_error(results, pending, FOREIGN_KEY_ERRORS.get(e.column, "Invalid reference"))
+                    remaining = []
+                pending = remaining
+                continue
+            record_batch_writes(results, pending, result.data, "post_id", "Failed to create post")
+            change_counters.bump("posts")
+            for row in result.data:
+                search_index.add(row["id"], row["content"])
+                event_broker.publish("post_created", {"post": row})
+            break
+        return finish_batch(results, "posts")
+
+    async def _check_references(self, items: list, results: list, pending: list):
+        """Fail pending items whose author does not exist; returns the indexes left"""
+        users = await self.db.get_users_by_ids({items[i]["user_id"] for i in pending}, ID_ONLY)
+        return reject_missing(items, results, pending, "user_id", {user["id"] for user in users})
+
+    async def get_all(self):
+        posts = await self.db.get_all_posts()
+        return posts if posts else []
+
+    async def get_page(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, fields: str = None):
+        selected = parse_fields(fields, "post")
+        if "error" in selected:
+            return selected
+        columns = selected["columns"]
+
+        page = await apaginate(
+            lambda size, after: self.db.get_posts_page(size, after, with_columns(columns, POST_KEYSET)),
+            limit, cursor, "date_posted"
+        )
+        if "error" in page:
+            return page
+        return {"posts": project(page["items"], columns), "next_cursor": page["next_cursor"]}
+
+    async def search(self, query: str, limit: int = DEFAULT_PAGE_SIZE):
+        """Posts matching every term of `query`, best match first.
+
+        The ranking comes from the in-process index; the rows themselves
+        are fetched with one `in_` query.
+        """
+        if not query or not query.strip():
+            return {"error": "Search query cannot be empty"}
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            return {"error": f"Limit must be between 1 and {MAX_PAGE_SIZE}"}
+
+        found = search_index.search(query, limit)
+        rows = {post["id"]: post for post in await self.db.get_posts_by_ids([post_id for post_id, _ in found["hits"]])}
+        posts = []
+        for post_id, score in found["hits"]:
+            post = rows.get(post_id)
+            if post is None:
+                # Deleted behind the index's back, e.g. by a cascading user delete
+                search_index.remove(post_id)
+                continue
+            posts.append({**post, **extract_tags(post["content"]), "score": round(score, 4)})
+        return {"posts": posts, "total": found["total"]}
+
+    async def build_search_index(self, batch_size: int = 1000):
+        """(Re)build the search index from every stored post; returns the number indexed"""
+        search_index.clear()
+        indexed, after = 0, None
+        while True:
+            rows = await self.db.get_posts_page(batch_size, after, ["id", "content", "date_posted"])
+            for row in rows:
+                search_index.add(row["id"], row["content"])
+            indexed += len(rows)
+            if len(rows) < batch_size:
+                return indexed
+            after = (rows[-1]["date_posted"], rows[-1]["id"])
+
+    async def get(self, post_id: int):
+        post = await self.db.get_post_by_id(post_id)
+        if not post:
+            return {"error": "Post not found"}
+        return post
+
+    async def update(self, post_id: int, content: str, user_id: int = None):
+        """`user_id`: the caller, from a session token; only their own post is updated"""
+        if user_id is not None or not self.direct_writes:
+            denied = check_owner(await self.db.get_post_by_id(post_id, OWNER_COLUMNS), "post", user_id)
+            if denied:
+                return denied
+        if not content or not content.strip():
+            return {"error": "Content cannot be empty"}
+
+        result = await self.db.update_post(post_id, content)
+
+        if hasattr(result, 'error') and result.error:
+            return {"error": str(result.error)}
+        if self.direct_writes and not result.data:
+            return {"error": "Post not found"}
+
+        change_counters.bump("posts")
+        search_index.add(post_id, content)
+        if result.data:
+            event_broker.publish("post_updated", {"post": result.data[0]})
+        return {"message": "Post updated successfully"}
+
+    async def delete(self, post_id: int, user_id: int = None):
+        """`user_id`: the caller, from a session token; only their own post is deleted"""
+        if user_id is not None or not self.direct_writes:
+            denied = check_owner(await self.db.get_post_by_id(post_id, OWNER_COLUMNS), "post", user_id)
+            if denied:
+                return denied
+
+        result = await self.db.delete_post(post_id)
+
+        if hasattr(result, 'error') and result.error:
+            return {"error": str(result.error)}
+        if self.direct_writes and not result.data:
+            return {"error": "Post not found"}
+
+        change_counters.bump("posts")
+        change_counters.bump("comments", post_id)
+        search_index.remove(post_id)
+        event_broker.publish("post_deleted", {"post_id": post_id})
+        return {"message": "Post deleted successfully"}
+
+
+# ---------------- COMMENT LOGIC ----------------
+class AsyncCommentLogic:
+    def __init__(self, write_mode: str = WRITE_MODE):
+        self.db = AsyncDatabaseManager()
+        # "direct" skips the existence reads and trusts the write result instead
+        self.direct_writes = write_mode == "direct"
+
+    async def create(self, user_id: int, post_id: int, content: str, authenticated: bool = False):
+        """`authenticated`: user_id comes from a verified session token, so only
+        the post is looked up"""
+        if not content or not content.strip():
+            return {"error": "Comment content cannot be empty"}
+        if not self.direct_writes:
+            if authenticated:
+                user, post = True, await self.db.get_post_by_id(post_id, ID_ONLY)
+            else:
+                # The two lookups are independent, so run them concurrently
+                user, post = await asyncio.gather(self.db.get_user_by_id(user_id, ID_ONLY), self.db.get_post_by_id(post_id, ID_ONLY))
+            if not user:
+                return {"error": "User not found"}
+            if not post:
+                return {"error": "Post not found"}
+
+        try:
+            result = await self.db.create_comment(user_id, post_id, content)
+        except ForeignKeyViolation as e:
+            return {"error": FOREIGN_KEY_ERRORS.get(e.column, "Invalid reference")}
+
+        if hasattr(result, 'error') and result.error:
+            return {"error": str(result.error)}
+
+        if result.data:
+            change_counters.bump("comments", post_id)
+            event_broker.publish("comment_created", {"comment": result.data[0]})
+            return {"message": "Comment created successfully", "comment_id": result.data[0]["id"]}
+        else:
+            return {"error": "Failed to create comment"}
+
+    async def create_many(self, items: list):
+        """Create comments from {"user_id", "post_id", "content"} dicts.
+
+        Authors and posts are checked with one `in_` query each, run
+        concurrently, and every valid comment is written with one multi-row
+        insert; results follow the input order.
+        """
+        batch = start_batch(items, "Comment content cannot be empty")
+        if "error" in batch:
+            return batch
+        results, pending = batch["results"], batch["pending"]
+
+        pending = await self._check_references(items, results, pending)
+        while pending:
+            try:
+                result = await self.db.create_comments([items[i] for i in pending])
+            except ForeignKeyViolation as e:
+                # A user or post was deleted after the check and the insert is all-or-nothing:
+                # fail only the comments that lost their author or post and write the rest again
+                remaining = await self._check_references(items, results, pending)
+                if len(remaining) == len(pending):
+                    record_batch_error(results, pending, FOREIGN_KEY_ERRORS.get(e.column, "Invalid reference"))
+                    remaining = []
+                pending = remaining
+                continue
+            record_batch_writes(results, pending, result.data, "comment_id", "Failed to create comment")
+            for post_id in {items[i]["post_id"] for i in pending if "error" not in results[i]}:
+                change_counters.bump("comments", post_id)
+            for row in result.data:
+                event_broker.publish("comment_created", {"comment": row})
+            break
+        return finish_batch(results, "comments")
+
+    async def _check_references(self, items: list, results: list, pending: list):
+        """Fail pending items whose author or post does not exist; returns the indexes left"""
+        users, posts = await asyncio.gather(
+            self.db.get_users_by_ids({items[i]["user_id"] for i in pending}, ID_ONLY),
+            self.db.get_posts_by_ids({items[i]["post_id"] for i in pending}, ID_ONLY),
+        )
+        pending = reject_missing(items, results, pending, "user_id", {user["id"] for user in users})
+        return reject_missing(items, results, pending, "post_id", {post["id"] for post in posts})
+
+    async def get(self, comment_id: int):
+        comment = await self.db.get_comment_by_id(comment_id)
+        if not comment:
+            return {"error": "Comment not found"}
+        return comment
+
+    async def get_by_post(self, post_id: int):
+        if not await self.db.get_post_by_id(post_id, ID_ONLY):
+            return {"error": "Post not found"}
+
+        comments = await self.db.get_comments_by_post(post_id)
+        return comments if comments else []
+
+    async def get_page_by_post(self, post_id: int, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, fields: str = None, authors: bool = False):
+        """One page of a post's comments; with `authors` each carries its author's username"""
+        selected = parse_fields(fields, "comment")
+        if "error" in selected:
+            return selected
+        columns = selected["columns"]
+        required = COMMENT_KEYSET + ["user_id"] if authors else COMMENT_KEYSET
+        if not await self.db.get_post_by_id(post_id, ID_ONLY):
+            return {"error": "Post not found"}
+
+        page = await apaginate(
+            lambda size, after: self.db.get_comments_page(post_id, size, after, with_columns(columns, required)),
+            limit, cursor, "date_commented"
+        )
+        if "error" in page:
+            return page
+        rows = page["items"]
+        comments = project(rows, columns)
+        if authors:
+            comments = with_authors(comments, rows, await self.db.get_authors(row["user_id"] for row in rows))
+        return {"comments": comments, "next_cursor": page["next_cursor"]}
+
+    async def update(self, comment_id: int, content: str, user_id: int = None):
+        """`user_id`: the caller, from a session token; only their own comment is updated"""
+        if user_id is not None or not self.direct_writes:
+            denied = check_owner(await self.db.get_comment_by_id(comment_id, OWNER_COLUMNS), "comment", user_id)
+            if denied:
+                return denied
+        if not content or not content.strip():
+            return {"error": "Content cannot be empty"}
+
+        result = await self.db.update_comment(comment_id, content)
+
+        if hasattr(result, 'error') and result.error:
+            return {"error": str(result.error)}
+        if self.direct_writes and not result.data:
+            return {"error": "Comment not found"}
+
+        record_comment_change("comment_updated", result)
+        return {"message": "Comment updated successfully"}
+
+    async def delete(self, comment_id: int, user_id: int = None):
+        """`user_id`: the caller, from a session token; only their own comment is deleted"""
+        if user_id is not None or not self.direct_writes:
+            denied = check_owner(await self.db.get_comment_by_id(comment_id, OWNER_COLUMNS), "comment", user_id)
+            if denied:
+                return denied
+
+        result = await self.db.delete_comment(comment_id)
+
+        if hasattr(result, 'error') and result.error:
+            return {"error": str(result.error)}
+        if self.direct_writes and not result.data:
+            return {"error": "Comment not found"}
+
+        record_comment_change("comment_deleted", result)
+        return {"message": "Comment deleted successfully"}
+
+
+# ---------------- FEED LOGIC ----------------
+class AsyncFeedLogic:
+    def __init__(self):
+        self.db = AsyncDatabaseManager()
+
+    async def get_page(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, comments: int = DEFAULT_FEED_COMMENTS, fields: str = None,
+                       authors: bool = False):
+        """One page of posts with their first `comments` comments and a comment
+        count; the count and the comments are fetched concurrently"""
+        if comments < 0 or comments > MAX_FEED_COMMENTS:
+            return {"error": f"Comments per post must be between 0 and {MAX_FEED_COMMENTS}"}
+        selected = parse_fields(fields, "post")
+        if "error" in selected:
+            return selected
+        columns = selected["columns"]
+        required = POST_KEYSET + ["user_id"] if authors else POST_KEYSET
+
+        page = await apaginate(
+            lambda size, after: self.db.get_posts_page(size, after, with_columns(columns, required)),
+            limit, cursor, "date_posted"
+        )
+        if "error" in page:
+            return page
+
+        posts = page["items"]
+        post_ids = [post["id"] for post in posts]
+        counts, first_comments = await asyncio.gather(
+            self.db.get_comment_counts(post_ids),
+            self.db.get_first_comments(post_ids, comments),
+        )
+        feed = assemble_feed(posts, first_comments, counts, columns)
+        if authors:
+            feed = embed_feed_authors(feed, posts, await self.db.get_authors(feed_author_ids(posts, feed)))
+        return {"posts": feed, "next_cursor": page["next_cursor"]}
@@ -0,0 +1,153 @@
+# src/auth.py
+"""Signed, expiring access tokens issued at login.
+
+A token is `payload.signature`: the payload is base64url JSON with the user
+id (`sub`), username, issue and expiry times and a random token id (`jti`);
+the signature is an HMAC-SHA256 of the payload under AUTH_SECRET. Checking
+one is a hash and a couple of dict lookups, so authenticated requests never
+touch the database.
+
+Revocation is in-process, like the change counters and the event broker:
+
+- logout revokes one token id until the token would have expired anyway;
+- deleting a user or changing their password revokes every token issued
+  to them before that moment.
+
+Every worker must share AUTH_SECRET for their tokens to be interchangeable.
+Without it a random secret is generated, and tokens die with the process.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+AUTH_SECRET = os.getenv("AUTH_SECRET") or secrets.token_hex(32)
+AUTH_TOKEN_TTL = float(os.getenv("AUTH_TOKEN_TTL", "3600"))
+# Reject requests that carry no token; off by default so existing clients
+# that only send user_id keep working
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "0") == "1"
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _encode(raw: bytes):
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode(text: str):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionTokens:
+    """Issues and verifies tokens and remembers which ones were revoked.
+
+    Thread-safe; the sync logic runs in worker threads and the async logic
+    on the event loop.
+    """
+
+    def __init__(self, secret: str = AUTH_SECRET, ttl: float = AUTH_TOKEN_TTL):
+        self._key = secret.encode("utf-8")
+        self.ttl = ttl
+        self._revoked = {}  # jti -> expiry; dropped once the token has expired
+        self._revoked_before = {}  # user_id -> tokens issued earlier are void
+        self._issued = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _sign(self, payload: bytes):
+        return hmac.new(self._key, payload, hashlib.sha256).digest()
+
+    def issue(self, user: dict):
+        """Token for a user row holding at least id and username"""
+        now = time.time()
+        claims = {
+            "sub": user["id"],
+            "name": user.get("username"),
+            "iat": now,
+            "exp": now + self.ttl,
+            "jti": secrets.token_urlsafe(12),
+        }
+        payload = _encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._issued += 1
+        signature = _encode(self._sign(payload.encode("ascii")))
+        return {"access_token": f"{payload}.{signature}", "token_type": "bearer", "expires_in": int(self.ttl)}
+
+    def verify(self, token: str):
+        """Claims of a valid token; raises InvalidToken otherwise"""
+        try:
+            return self._verify(token)
+        except InvalidToken:
+            with self._lock:
+                self._rejected += 1
+            raise
+
+    def _verify(self, token: str):
+        # Tokens come straight from request headers: anything malformed,
+        # whatever the reason, is just an invalid token (401), never a 500
+        try:
+            payload, _, signature = (token or "").partition(".")
+            expected = _encode(self._sign(payload.encode("ascii"))).encode("ascii")
+            if not payload or not hmac.compare_digest(signature.encode("ascii"), expected):
+                raise InvalidToken("Invalid token")
+            claims = json.loads(_decode(payload))
+            if not {"sub", "iat", "exp", "jti"} <= claims.keys():
+                raise InvalidToken("Invalid token")
+            expired = claims["exp"] <= time.time()
+        except (ValueError, TypeError, AttributeError):
+            # UnicodeError and binascii.Error are ValueErrors
+            raise InvalidToken("Invalid token")
+        if expired:
+            raise InvalidToken("Token expired")
+        with self._lock:
+            revoked = claims["jti"] in self._revoked or claims["iat"] < self._revoked_before.get(claims["sub"], 0)
+        if revoked:
+            raise InvalidToken("Token revoked")
+        return claims
+
+    def user_id(self, token: str):
+        """User id of a valid token, else None; unlike verify(), not counted as a rejection"""
+        try:
+            return self._verify(token)["sub"]
+        except InvalidToken:
+            return None
+
+    def revoke(self, claims: dict):
+        """Void one token, such as on logout"""
+        with self._lock:
+            self._prune()
+            self._revoked[claims["jti"]] = claims["exp"]
+
+    def revoke_user(self, user_id: int):
+        """Void every token issued to a user until now"""
+        with self._lock:
+            self._prune()
+            self._revoked_before[user_id] = time.time()
+
+    def _prune(self):
+        """Forget revocations that every affected token has outlived"""
+        now = time.time()
+        self._revoked = {jti: expires for jti, expires in self._revoked.items() if expires > now}
+        self._revoked_before = {
+            user_id: cutoff for user_id, cutoff in self._revoked_before.items() if cutoff + self.ttl > now
+        }
+
+    def stats(self):
+        with self._lock:
+            self._prune()
+            return {
+                "issued": self._issued,
+                "rejected": self._rejected,
+                "revoked_tokens": len(self._revoked),
+                "revoked_users": len(self._revoked_before),
+            }
+
+
+# Shared by the sync and async logic layers and the API
+session_tokens = SessionTokens()
@@ -0,0 +1,162 @@
+# src/backends/__init__.py
+"""Storage backends behind DatabaseManager.
+
+A backend knows how to run four primitive operations against the `user`,
+`post` and `comment` tables and returns plain lists of row dicts:
+
+    select(table, columns="*", filters=None, in_filter=None, order=None, limit=None, after=None)
+    insert(table, rows)
+    update(table, values, row_id)
+    delete(table, row_id)
+
+`order` is a list of (column, desc) pairs and `after` is a keyset tuple
+with one value per ordered column; rows strictly after it in that order are
+returned. Caching, logging and timestamps stay in DatabaseManager.
+
+Two grouped reads serve the feed, one query each however many groups:
+
+    count_by(table, column, values)
+        {value: number of rows whose foreign key `column` equals it}
+    select_first(table, column, values, per_value, columns="*", order=None)
+        up to `per_value` rows for each value, in `order`
+
+`column` is a foreign key (FOREIGN_KEYS), so Supabase can answer both by
+embedding `table` in the parent rows.
+
+DB_BACKEND picks the implementation: "supabase" (default) or "sqlite".
+Nothing is connected, and .env is not read, until a backend is first asked
+for, so importing the package needs neither credentials nor a network.
+"""
+import asyncio
+import os
+import threading
+from ..metrics import InstrumentedBackend
+
+# Column whitelist shared by every backend; identifiers are never taken from user input unchecked
+TABLE_COLUMNS = {
+    "user": ("id", "username", "email", "password"),
+    "post": ("id", "content", "date_posted", "user_id"),
+    "comment": ("id", "content", "date_commented", "user_id", "post_id"),
+}
+
+# Which table each foreign-key column points at
+FOREIGN_KEYS = {"user_id": "user", "post_id": "post"}
+
+
+class ForeignKeyViolation(Exception):
+    """An insert referenced a row that does not exist; `column` names the foreign key"""
+
+    def __init__(self, column: str):
+        super().__init__(f"Foreign key violation on {column}")
+        self.column = column
+
+
+class WriteOutcomeUnknown(Exception):
+    """An insert failed after it may have reached the database, so it may or
+    may not have been committed; retrying it could store the rows twice"""
+
+
+def check_columns(table: str, columns):
+    """Raise ValueError unless every column exists on `table`"""
+    known = TABLE_COLUMNS[table]
+    for column in columns:
+        if column not in known:
+            raise ValueError(f"Unknown column {column!r} on table {table!r}")
+
+
+class ThreadedAsyncBackend:
+    """Async facade over a blocking backend, running each call in a worker thread"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def select(self, *args, **kwargs):
+        return await asyncio.to_thread(self.backend.select, *args, **kwargs)
+
+    async def insert(self, *args, **kwargs):
+        return await asyncio.to_thread(self.backend.insert, *args, **kwargs)
+
+    async def update(self, *args, **kwargs):
+        return await asyncio.to_thread(self.backend.update, *args, **kwargs)
+
+    async def delete(self, *args, **kwargs):
+        return await asyncio.to_thread(self.backend.delete, *args, **kwargs)
+
+    async def count_by(self, *args, **kwargs):
+        return await asyncio.to_thread(self.backend.count_by, *args, **kwargs)
+
+    async def select_first(self, *args, **kwargs):
+        return await asyncio.to_thread(self.backend.select_first, *args, **kwargs)
+
+
+_backend = None
+_async_backend = None
+_env_loaded = False
+_lock = threading.RLock()
+
+
+def load_env():
+    """Read .env into os.environ once; variables already set win.
+
+    Entry points call this before importing modules that read settings at
+    import time; the backends call it before they first need credentials.
+    """
+    global _env_loaded
+    if not _env_loaded:
+        with _lock:
+            if not _env_loaded:
+                from dotenv import load_dotenv
+                load_dotenv()
+                _env_loaded = True
+
+
+def backend_name():
+    return os.getenv("DB_BACKEND", "supabase").lower()
+
+
+def get_backend():
+    """The process-wide blocking backend, created on first use"""
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                load_env()
+                name = backend_name()
+                if name == "sqlite":
+                    from .sqlite_backend import SQLiteBackend
+                    _backend = InstrumentedBackend(SQLiteBackend())
+                elif name == "supabase":
+                    from .supabase_backend import SupabaseBackend
+                    _backend = InstrumentedBackend(SupabaseBackend())
+                else:
+                    raise ValueError(f"Unknown DB_BACKEND {name!r}, expected 'supabase' or 'sqlite'")
+    return _backend
+
+
+def get_async_backend():
+    """The process-wide async backend, created on first use"""
+    global _async_backend
+    if _async_backend is None:
+        with _lock:
+            if _async_backend is None:
+                load_env()
+                if backend_name() == "supabase":
+                    from .supabase_backend import AsyncSupabaseBackend
+                    _async_backend = InstrumentedBackend(AsyncSupabaseBackend())
+                else:
+                    # SQLite has no async driver in the stdlib; a worker thread per call is cheap next to the query
+                    _async_backend = ThreadedAsyncBackend(get_backend())
+    return _async_backend
+
+
+def transport_stats():
+    """HTTP connection pool usage of the backends created so far, by client.
+
+    Empty for SQLite, and never creates a backend itself.
+    """
+    stats = {}
+    for client, backend in (("sync", _backend), ("async", _async_backend)):
+        read = getattr(backend, "transport_stats", None)
+        if read is not None:
+            stats[client] = read()
+    return stats
@@ -0,0 +1,183 @@
+# src/backends/sqlite_backend.py
+import os
+import sqlite3
+import threading
+from . import ForeignKeyViolation, FOREIGN_KEYS, TABLE_COLUMNS, check_columns
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "social_network.db")
+
+# Mirrors the Supabase schema in the README
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS "user" (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(20) UNIQUE NOT NULL,
+    email VARCHAR(120) UNIQUE NOT NULL,
+    password VARCHAR(60) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS post (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content TEXT NOT NULL,
+    date_posted TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS comment (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content TEXT NOT NULL,
+    date_commented TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    post_id INTEGER NOT NULL REFERENCES post(id) ON DELETE CASCADE
+);
+
+-- user.email is already covered by the index behind its UNIQUE constraint
+CREATE INDEX IF NOT EXISTS idx_post_date_posted ON post(date_posted DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_post_user_id ON post(user_id);
+CREATE INDEX IF NOT EXISTS idx_comment_post_id ON comment(post_id, date_commented, id);
+CREATE INDEX IF NOT EXISTS idx_comment_user_id ON comment(user_id);
+"""
+
+
+def _quote(identifier: str):
+    return f'"{identifier}"'
+
+
+class SQLiteBackend:
+    """Embedded backend on a local SQLite file.
+
+    Each thread gets its own connection; WAL mode lets readers run while a
+    writer holds the lock.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Close every connection opened by this backend"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def select(self, table: str, columns="*", filters=None, in_filter=None, order=None, limit=None, after=None):
+        if columns != "*":
+            check_columns(table, columns)
+            columns = ", ".join(_quote(column) for column in columns)
+        where, params = [], []
+        for column, value in (filters or {}).items():
+            check_columns(table, [column])
+            where.append(f"{_quote(column)} = ?")
+            params.append(value)
+        if in_filter:
+            column, values = in_filter
+            check_columns(table, [column])
+            if not values:
+                return []
+            where.append(f"{_quote(column)} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        if order:
+            check_columns(table, [column for column, _ in order])
+        if after and order:
+            # Row-value comparison; every keyset in this app orders all columns the same way
+            op = "<" if order[0][1] else ">"
+            keyset = ", ".join(_quote(column) for column, _ in order)
+            where.append(f"({keyset}) {op} ({', '.join('?' * len(after))})")
+            params.extend(after)
+
+        sql = f"SELECT {columns} FROM {_quote(table)}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if order:
+            sql += " ORDER BY " + ", ".join(f"{_quote(column)} {'DESC' if desc else 'ASC'}" for column, desc in order)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._connect().execute(sql, params)]
+
+    def count_by(self, table: str, column: str, values: list):
+        check_columns(table, [column])
+        if not values:
+            return {}
+        sql = (
+            f"SELECT {_quote(column)}, COUNT(*) FROM {_quote(table)} "
+            f"WHERE {_quote(column)} IN ({', '.join('?' * len(values))}) GROUP BY {_quote(column)}"
+        )
+        return {value: count for value, count in self._connect().execute(sql, list(values))}
+
+    def select_first(self, table: str, column: str, values: list, per_value: int, columns="*", order=None):
+        columns = TABLE_COLUMNS[table] if columns == "*" else columns
+        check_columns(table, [column, *columns, *(name for name, _ in order or [])])
+        if not values or per_value < 1:
+            return []
+        ordering = ", ".join(f"{_quote(name)} {'DESC' if desc else 'ASC'}" for name, desc in order or [("id", False)])
+        selected = ", ".join(_quote(name) for name in columns)
+        # Numbered within each group, so the LIMIT applies per value rather than overall
+        sql = (
+            f"SELECT {selected} FROM ("
+            f"SELECT *, ROW_NUMBER() OVER (PARTITION BY {_quote(column)} ORDER BY {ordering}) AS position "
+            f"FROM {_quote(table)} WHERE {_quote(column)} IN ({', '.join('?' * len(values))})"
+            f") WHERE position <= ? ORDER BY {_quote(column)}, {ordering}"
+        )
+        return [dict(row) for row in self._connect().execute(sql, [*values, per_value])]
+
+    def insert(self, table: str, rows: list):
+        if not rows:
+            return []
+        columns = list(rows[0])
+        check_columns(table, columns)
+        sql = (
+            f"INSERT INTO {_quote(table)} ({', '.join(_quote(column) for column in columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))}) RETURNING *"
+        )
+        conn = self._connect()
+        try:
+            with conn:
+                inserted = []
+                for row in rows:
+                    inserted.extend(dict(r) for r in conn.execute(sql, [row[column] for column in columns]).fetchall())
+                return inserted
+        except sqlite3.IntegrityError as e:
+            if "FOREIGN KEY" not in str(e):
+                raise
+            # SQLite does not say which key failed; find the first missing reference
+            for row in rows:
+                for column, parent in FOREIGN_KEYS.items():
+                    if column in row and not self.select(parent, ["id"], filters={"id": row[column]}):
+                        raise ForeignKeyViolation(column) from e
+            raise ForeignKeyViolation("unknown") from e
+
+    def update(self, table: str, values: dict, row_id: int):
+        check_columns(table, values)
+        assignments = ", ".join(f"{_quote(column)} = ?" for column in values)
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE {_quote(table)} SET {assignments} WHERE id = ? RETURNING *",
+                [*values.values(), row_id],
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def delete(self, table: str, row_id: int):
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(f"DELETE FROM {_quote(table)} WHERE id = ? RETURNING *", [row_id])
+            return [dict(row) for row in cursor.fetchall()]
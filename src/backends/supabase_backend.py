@@ -0,0 +1,331 @@
+# src/backends/supabase_backend.py
+"""Supabase (PostgREST over HTTPS) backends.
+
+Both clients share one pooled httpx transport configuration: how many
+connections may be open, how many idle ones are kept alive and for how
+long, HTTP/2 (when the h2 package is installed, so concurrent queries
+multiplex over a few connections) and the connect/read/pool timeouts.
+Each transport counts requests in flight and pool timeouts so the pool can
+be sized to the worker concurrency; see transport_stats().
+
+Handing supabase-py an httpx client (ClientOptions.httpx_client) needs
+supabase 2.16.0 or later.
+"""
+import asyncio
+import os
+import re
+import threading
+import httpx
+from postgrest.exceptions import APIError
+from supabase import create_client, acreate_client, Client, AsyncClient, ClientOptions, AsyncClientOptions
+from . import ForeignKeyViolation, WriteOutcomeUnknown, FOREIGN_KEYS, check_columns
+
+try:
+    import h2  # noqa: F401
+except ImportError:  # optional; HTTP/1.1 otherwise (pip install h2)
+    h2 = None
+
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "100"))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "20"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "1") == "1" and h2 is not None
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+SUPABASE_READ_TIMEOUT = float(os.getenv("SUPABASE_READ_TIMEOUT", "30"))
+# How long a query waits for a free connection before failing with PoolTimeout
+SUPABASE_POOL_TIMEOUT = float(os.getenv("SUPABASE_POOL_TIMEOUT", "10"))
+
+
+def _credentials():
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    # Check if environment variables are loaded
+    if not url or not key:
+        raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+    return url, key
+
+
+def _transport_options():
+    return {
+        "limits": httpx.Limits(
+            max_connections=SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+        ),
+        "http2": SUPABASE_HTTP2,
+    }
+
+
+def _timeout():
+    return httpx.Timeout(
+        SUPABASE_READ_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT, pool=SUPABASE_POOL_TIMEOUT,
+    )
+
+
+class PoolUsage:
+    """Requests in flight on one transport, their peak, and pool timeouts"""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._in_flight = 0
+        self._peak = 0
+        self._requests = 0
+        self._pool_timeouts = 0
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            self._requests += 1
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+
+    def finished(self, error: Exception = None):
+        with self._lock:
+            self._in_flight -= 1
+            if isinstance(error, httpx.PoolTimeout):
+                self._pool_timeouts += 1
+
+    def stats(self):
+        connections = list(self._pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        with self._lock:
+            return {
+                "max_connections": SUPABASE_MAX_CONNECTIONS,
+                "http2": SUPABASE_HTTP2,
+                "connections": len(connections),
+                "idle_connections": idle,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak,
+                # Above 1 with HTTP/1.1 means queries queue for a connection
+                "utilization": round(self._in_flight / SUPABASE_MAX_CONNECTIONS, 3),
+                "requests": self._requests,
+                "pool_timeouts": self._pool_timeouts,
+            }
+
+
+class CountingTransport(httpx.HTTPTransport):
+    """Pooled transport that keeps PoolUsage up to date"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # httpx keeps its httpcore pool private; its connection list is only read for stats
+        self.usage = PoolUsage(self._pool)
+
+    def handle_request(self, request):
+        self.usage.started()
+        error = None
+        try:
+            return super().handle_request(request)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.usage.finished(error)
+
+
+class AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    """Async twin of CountingTransport"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.usage = PoolUsage(self._pool)
+
+    async def handle_async_request(self, request):
+        self.usage.started()
+        error = None
+        try:
+            return await super().handle_async_request(request)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.usage.finished(error)
+
+
+def _quote(value):
+    """Render a value for a PostgREST logical filter, quoting strings"""
+    if isinstance(value, str):
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return str(value)
+
+
+def _keyset_filter(order: list, after: tuple):
+    """PostgREST or=() filter selecting rows strictly after `after` in `order`"""
+    clauses = []
+    for i, (column, desc) in enumerate(order):
+        op = "lt" if desc else "gt"
+        equal = [f"{prev}.eq.{_quote(value)}" for (prev, _), value in zip(order[:i], after)]
+        condition = f"{column}.{op}.{_quote(after[i])}"
+        clauses.append(f"and({','.join(equal + [condition])})" if equal else condition)
+    return ",".join(clauses)
+
+
+def _select_query(builder, table: str, columns="*", filters=None, in_filter=None, order=None, limit=None, after=None):
+    """Build a select on a sync or async table builder; both share the same fluent API"""
+    if columns != "*":
+        check_columns(table, columns)
+        columns = ",".join(columns)
+    query = builder.select(columns)
+    for column, value in (filters or {}).items():
+        query = query.eq(column, value)
+    if in_filter:
+        query = query.in_(*in_filter)
+    if after and order:
+        query = query.or_(_keyset_filter(order, after))
+    for column, desc in order or []:
+        query = query.order(column, desc=desc)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def _count_query(client, table: str, column: str, values: list):
+    """Rows of the parent table with an embedded count of their `table` rows"""
+    check_columns(table, [column])
+    return client.table(FOREIGN_KEYS[column]).select(f"id,{table}(count)").in_("id", list(values))
+
+
+def _counts(rows: list, table: str):
+    return {row["id"]: row[table][0]["count"] for row in rows if row[table]}
+
+
+def _first_query(client, table: str, column: str, values: list, per_value: int, columns="*", order=None):
+    """Rows of the parent table embedding their first `per_value` `table` rows;
+    an embedded limit applies per parent row"""
+    if columns != "*":
+        check_columns(table, columns)
+        columns = ",".join(columns)
+    check_columns(table, [column])
+    query = client.table(FOREIGN_KEYS[column]).select(f"id,{table}({columns})").in_("id", list(values))
+    for name, desc in order or []:
+        query = query.order(name, desc=desc, foreign_table=table)
+    return query.limit(per_value, foreign_table=table)
+
+
+def _embedded(rows: list, table: str):
+    return [child for row in rows for child in row[table]]
+
+
+# Transport errors raised before the request left: nothing reached PostgREST
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def foreign_key_column(error: Exception):
+    """Column behind a Postgres foreign-key violation (SQLSTATE 23503), else None"""
+    if not isinstance(error, APIError) or error.code != "23503":
+        return None
+    match = re.search(r"Key \((\w+)\)", error.details or "")
+    if not match:
+        match = re.search(r"_(\w+?_id)_fkey", error.message or "")
+    return match.group(1) if match else "unknown"
+
+
+class SupabaseBackend:
+    """Blocking backend on the Supabase (PostgREST) client"""
+
+    def __init__(self):
+        url, key = _credentials()
+        self._transport = CountingTransport(**_transport_options())
+        http_client = httpx.Client(transport=self._transport, timeout=_timeout(), follow_redirects=True)
+        self.client: Client = create_client(url, key, ClientOptions(httpx_client=http_client))
+
+    def transport_stats(self):
+        return self._transport.usage.stats()
+
+    def select(self, table: str, columns="*", filters=None, in_filter=None, order=None, limit=None, after=None):
+        query = _select_query(self.client.table(table), table, columns, filters, in_filter, order, limit, after)
+        return query.execute().data or []
+
+    def insert(self, table: str, rows: list):
+        try:
+            return self.client.table(table).insert(rows).execute().data or []
+        except httpx.TransportError as e:
+            # A timeout or dropped connection after sending leaves the commit unknown
+            if isinstance(e, UNSENT_ERRORS):
+                raise
+            raise WriteOutcomeUnknown(str(e) or type(e).__name__) from e
+        except APIError as e:
+            column = foreign_key_column(e)
+            if column:
+                raise ForeignKeyViolation(column) from e
+            raise
+
+    def update(self, table: str, values: dict, row_id: int):
+        return self.client.table(table).update(values).eq("id", row_id).execute().data or []
+
+    def delete(self, table: str, row_id: int):
+        return self.client.table(table).delete().eq("id", row_id).execute().data or []
+
+    def count_by(self, table: str, column: str, values: list):
+        if not values:
+            return {}
+        return _counts(_count_query(self.client, table, column, values).execute().data or [], table)
+
+    def select_first(self, table: str, column: str, values: list, per_value: int, columns="*", order=None):
+        if not values or per_value < 1:
+            return []
+        query = _first_query(self.client, table, column, values, per_value, columns, order)
+        return _embedded(query.execute().data or [], table)
+
+
+class AsyncSupabaseBackend:
+    """asyncio backend on the async Supabase client.
+
+    The async client has to be built inside a running event loop, so it is
+    created on first use rather than in __init__.
+    """
+
+    def __init__(self):
+        self._credentials = _credentials()
+        self._client: AsyncClient = None
+        self._client_lock = asyncio.Lock()
+        self._transport = AsyncCountingTransport(**_transport_options())
+
+    async def _table(self, name: str):
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    http_client = httpx.AsyncClient(transport=self._transport, timeout=_timeout(), follow_redirects=True)
+                    self._client = await acreate_client(
+                        *self._credentials, AsyncClientOptions(httpx_client=http_client)
+                    )
+        return self._client.table(name)
+
+    def transport_stats(self):
+        return self._transport.usage.stats()
+
+    async def select(self, table: str, columns="*", filters=None, in_filter=None, order=None, limit=None, after=None):
+        query = _select_query(await self._table(table), table, columns, filters, in_filter, order, limit, after)
+        return (await query.execute()).data or []
+
+    async def insert(self, table: str, rows: list):
+        try:
+            return (await (await self._table(table)).insert(rows).execute()).data or []
+        except httpx.TransportError as e:
+            # A timeout or dropped connection after sending leaves the commit unknown
+            if isinstance(e, UNSENT_ERRORS):
+                raise
+            raise WriteOutcomeUnknown(str(e) or type(e).__name__) from e
+        except APIError as e:
+            column = foreign_key_column(e)
+            if column:
+                raise ForeignKeyViolation(column) from e
+            raise
+
+    async def update(self, table: str, values: dict, row_id: int):
+        return (await (await self._table(table)).update(values).eq("id", row_id).execute()).data or []
+
+    async def delete(self, table: str, row_id: int):
+        return (await (await self._table(table)).delete().eq("id", row_id).execute()).data or []
+
+    async def count_by(self, table: str, column: str, values: list):
+        if not values:
+            return {}
+        await self._table(table)  # creates the client on first use
+        return _counts((await _count_query(self._client, table, column, values).execute()).data or [], table)
+
+    async def select_first(self, table: str, column: str, values: list, per_value: int, columns="*", order=None):
+        if not values or per_value < 1:
+            return []
+        await self._table(table)
+        query = _first_query(self._client, table, column, values, per_value, columns, order)
+        return _embedded((await query.execute()).data or [], table)
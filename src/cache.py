@@ -0,0 +1,97 @@
+# src/cache.py
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache where every entry carries its own TTL.
+
+    Any object with the same get/set/delete/delete_where/clear/stats methods
+    can stand in for it (see DatabaseManager.cache).
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for `key`, or MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Drop every entry for which predicate(key, value) is true"""
+        with self._lock:
+            stale = [key for key, (value, _) in self._entries.items() if predicate(key, value)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class NullCache:
+    """Cache that stores nothing, used when caching is disabled"""
+
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value, ttl: float):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def delete_where(self, predicate):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"size": 0, "max_size": 0, "hits": 0, "misses": 0, "evictions": 0, "hit_ratio": 0.0}
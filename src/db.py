@@ -1,55 +1,174 @@
 import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
 from datetime import datetime
+from .metrics import instrument_methods
+from .cache import TTLCache, NullCache, MISSING
+from .backends import get_backend, ForeignKeyViolation
 
-load_dotenv()
+# Read-through cache settings (seconds); set CACHE_ENABLED=0 to turn it off
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") != "0"
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "2048"))
+CACHE_TTLS = {
+    "user": float(os.getenv("CACHE_TTL_USER", "300")),
+    "post": float(os.getenv("CACHE_TTL_POST", "60")),
+    "comments": float(os.getenv("CACHE_TTL_COMMENTS", "15")),
+    "author": float(os.getenv("CACHE_TTL_AUTHOR", "300")),
+}
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Everything but the password hash
+USER_PUBLIC_COLUMNS = ["id", "username", "email"]
+# What any client may read about another user
+AUTHOR_COLUMNS = ["id", "username"]
+# Enough to tell whether a row exists
+ID_ONLY = ["id"]
 
-# Check if environment variables are loaded
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+POSTS_NEWEST_FIRST = [("date_posted", True), ("id", True)]
+COMMENTS_OLDEST_FIRST = [("date_commented", False), ("id", False)]
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+def project(rows, columns):
+    """Cut a row, or a list of rows, down to `columns`; "*" keeps every column"""
+    if columns == "*" or rows is None:
+        return rows
+    if isinstance(rows, list):
+        return [{column: row[column] for column in columns} for row in rows]
+    return {column: rows[column] for column in columns}
 
+
+class WriteResult:
+    """Rows returned by a write, shaped like the Supabase response the logic layer reads"""
+
+    def __init__(self, data: list):
+        self.data = data
+
+
+@instrument_methods
 class DatabaseManager:
+    """Read methods take `columns`, a list of column names or "*".
+
+    Only full rows are cached; a projected read is served from a cached full
+    row when there is one and otherwise selects just those columns.
+    """
+
+    # Shared by every instance; swap for any object with the TTLCache interface
+    cache = TTLCache(CACHE_MAX_SIZE) if CACHE_ENABLED else NullCache()
+
+    # ---------------- CACHE ----------------
+    @staticmethod
+    def _invalidate_user(user_id: int):
+        cache = DatabaseManager.cache
+        cache.delete(("user", user_id))
+        cache.delete(("author", user_id))
+        cache.delete_where(lambda key, value: key[0] == "user_email" and value["id"] == user_id)
+
+    @staticmethod
+    def _invalidate_comments(post_id: int = None, comment_id: int = None, result=None):
+        """Drop cached comment lists for a post, or the lists holding a comment.
+
+        When the write `result` returns the affected row its post_id is used,
+        so every cached page of that thread goes.
+        """
+        rows = getattr(result, "data", None) or []
+        if post_id is None and rows:
+            post_id = rows[0].get("post_id")
+
+        def stale(key, value):
+            if key[0] != "comments":
+                return False
+            if post_id is not None:
+                return key[1] == post_id
+            return any(comment["id"] == comment_id for comment in value)
+
+        DatabaseManager.cache.delete_where(stale)
+
     # ---------------- USERS ----------------
     @staticmethod
     def create_user(username: str, email: str, password: str):
         """Insert a new user"""
         try:
-            return supabase.table("user").insert({
+            result = WriteResult(get_backend().insert("user", [{
                 "username": username,
                 "email": email,
                 "password": password
-            }).execute()
+            }]))
+            DatabaseManager.cache.delete(("user_email", email))
+            return result
         except Exception as e:
             print(f"Database error in create_user: {e}")
             raise
 
     @staticmethod
-    def get_user_by_id(user_id: int):
+    def get_user_by_id(user_id: int, columns="*"):
         """Get a user by ID"""
+        cached = DatabaseManager.cache.get(("user", user_id))
+        if cached is not MISSING:
+            return project(cached, columns)
         try:
-            response = supabase.table("user").select("*").eq("id", user_id).execute()
-            return response.data[0] if response.data else None
+            # Always the whole row, so narrow lookups such as existence checks fill the cache too
+            rows = get_backend().select("user", "*", filters={"id": user_id})
+            user = rows[0] if rows else None
+            if user:
+                DatabaseManager.cache.set(("user", user_id), user, CACHE_TTLS["user"])
+            return project(user, columns)
         except Exception as e:
             print(f"Database error in get_user_by_id: {e}")
             return None
 
     @staticmethod
-    def get_user_by_email(email: str):
+    def get_user_by_email(email: str, columns="*"):
         """Get a user by email"""
+        cached = DatabaseManager.cache.get(("user_email", email))
+        if cached is not MISSING:
+            return project(cached, columns)
         try:
-            response = supabase.table("user").select("*").eq("email", email).execute()
-            return response.data[0] if response.data else None
+            # Always the whole row, so narrow lookups such as existence checks fill the cache too
+            rows = get_backend().select("user", "*", filters={"email": email})
+            user = rows[0] if rows else None
+            if user:
+                DatabaseManager.cache.set(("user_email", email), user, CACHE_TTLS["user"])
+            return project(user, columns)
         except Exception as e:
             print(f"Database error in get_user_by_email: {e}")
             return None
 
+    @staticmethod
+    def get_users_by_ids(user_ids: list, columns=USER_PUBLIC_COLUMNS):
+        """Get several users in one query, without their password hashes by default"""
+        if not user_ids:
+            return []
+        try:
+            return get_backend().select("user", columns, in_filter=("id", list(user_ids)))
+        except Exception as e:
+            print(f"Database error in get_users_by_ids: {e}")
+            raise
+
+    @staticmethod
+    def get_authors(user_ids):
+        """Public profiles of several users as {user_id: {"id", "username"}}.
+
+        Read through the cache one author at a time; every miss is fetched in
+        a single `in_` query. Unknown ids are left out.
+        """
+        cache = DatabaseManager.cache
+        authors = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            cached = cache.get(("author", user_id))
+            if cached is MISSING:
+                missing.append(user_id)
+            else:
+                authors[user_id] = cached
+        if not missing:
+            return authors
+        try:
+            rows = get_backend().select("user", AUTHOR_COLUMNS, in_filter=("id", missing))
+        except Exception as e:
+            print(f"Database error in get_authors: {e}")
+            raise
+        for row in rows:
+            authors[row["id"]] = row
+            cache.set(("author", row["id"]), row, CACHE_TTLS["author"])
+        return authors
+
     @staticmethod
     def update_user(user_id: int, username: str = None, email: str = None, password: str = None):
         """Update user info"""
@@ -61,11 +180,13 @@ class DatabaseManager:
                 data["email"] = email
             if password:
                 data["password"] = password
-            
+
             if not data:
                 return {"error": "No data to update"}
-            
-            return supabase.table("user").update(data).eq("id", user_id).execute()
+
+            result = WriteResult(get_backend().update("user", data, user_id))
+            DatabaseManager._invalidate_user(user_id)
+            return result
         except Exception as e:
             print(f"Database error in update_user: {e}")
             raise
@@ -74,7 +195,11 @@ class DatabaseManager:
     def delete_user(user_id: int):
         """Delete a user"""
         try:
-            return supabase.table("user").delete().eq("id", user_id).execute()
+            result = WriteResult(get_backend().delete("user", user_id))
+            DatabaseManager._invalidate_user(user_id)
+            # Posts and comments cascade with the user
+            DatabaseManager.cache.delete_where(lambda key, value: key[0] in ("post", "comments"))
+            return result
         except Exception as e:
             print(f"Database error in delete_user: {e}")
             raise
@@ -84,43 +209,88 @@ class DatabaseManager:
     def create_post(user_id: int, content: str):
         """Insert a new post"""
         try:
-            return supabase.table("post").insert({
+            return WriteResult(get_backend().insert("post", [{
                 "user_id": user_id,
                 "content": content,
                 "date_posted": datetime.now().isoformat()
-            }).execute()
+            }]))
+        except ForeignKeyViolation:
+            raise
         except Exception as e:
             print(f"Database error in create_post: {e}")
             raise
 
     @staticmethod
-    def get_post_by_id(post_id: int):
+    def create_posts(posts: list):
+        """Insert several posts ({"user_id", "content"} dicts) in one multi-row insert"""
+        now = datetime.now().isoformat()
+        try:
+            return WriteResult(get_backend().insert("post", [
+                {"user_id": post["user_id"], "content": post["content"], "date_posted": now} for post in posts
+            ]))
+        except ForeignKeyViolation:
+            raise
+        except Exception as e:
+            print(f"Database error in create_posts: {e}")
+            raise
+
+    @staticmethod
+    def get_post_by_id(post_id: int, columns="*"):
         """Get a post by ID"""
+        cached = DatabaseManager.cache.get(("post", post_id))
+        if cached is not MISSING:
+            return project(cached, columns)
         try:
-            response = supabase.table("post").select("*").eq("id", post_id).execute()
-            return response.data[0] if response.data else None
+            # Always the whole row, so narrow lookups such as existence checks fill the cache too
+            rows = get_backend().select("post", "*", filters={"id": post_id})
+            post = rows[0] if rows else None
+            if post:
+                DatabaseManager.cache.set(("post", post_id), post, CACHE_TTLS["post"])
+            return project(post, columns)
         except Exception as e:
             print(f"Database error in get_post_by_id: {e}")
             return None
 
     @staticmethod
-    def get_all_posts():
+    def get_posts_by_ids(post_ids: list, columns="*"):
+        """Get several posts in one query"""
+        if not post_ids:
+            return []
+        try:
+            return get_backend().select("post", columns, in_filter=("id", list(post_ids)))
+        except Exception as e:
+            print(f"Database error in get_posts_by_ids: {e}")
+            raise
+
+    @staticmethod
+    def get_all_posts(columns="*"):
         """Get all posts ordered by date (newest first)"""
         try:
-            response = supabase.table("post").select("*").order("date_posted", desc=True).execute()
-            return response.data if response.data else []
+            return get_backend().select("post", columns, order=POSTS_NEWEST_FIRST)
         except Exception as e:
             print(f"Database error in get_all_posts: {e}")
             return []
 
+    @staticmethod
+    def get_posts_page(limit: int, after: tuple = None, columns="*"):
+        """Get up to `limit` posts ordered newest first, starting after the
+        (date_posted, id) keyset `after`"""
+        try:
+            return get_backend().select("post", columns, order=POSTS_NEWEST_FIRST, limit=limit, after=after)
+        except Exception as e:
+            print(f"Database error in get_posts_page: {e}")
+            return []
+
     @staticmethod
     def update_post(post_id: int, content: str):
         """Update post content"""
         try:
-            return supabase.table("post").update({
+            result = WriteResult(get_backend().update("post", {
                 "content": content,
                 "date_posted": datetime.now().isoformat()  # Update timestamp
-            }).eq("id", post_id).execute()
+            }, post_id))
+            DatabaseManager.cache.delete(("post", post_id))
+            return result
         except Exception as e:
             print(f"Database error in update_post: {e}")
             raise
@@ -129,7 +299,10 @@ class DatabaseManager:
     def delete_post(post_id: int):
         """Delete a post"""
         try:
-            return supabase.table("post").delete().eq("id", post_id).execute()
+            result = WriteResult(get_backend().delete("post", post_id))
+            DatabaseManager.cache.delete(("post", post_id))
+            DatabaseManager._invalidate_comments(post_id=post_id)
+            return result
         except Exception as e:
             print(f"Database error in delete_post: {e}")
             raise
@@ -139,44 +312,114 @@ class DatabaseManager:
     def create_comment(user_id: int, post_id: int, content: str):
         """Insert a new comment"""
         try:
-            return supabase.table("comment").insert({
+            result = WriteResult(get_backend().insert("comment", [{
                 "user_id": user_id,
                 "post_id": post_id,
                 "content": content,
                 "date_commented": datetime.now().isoformat()
-            }).execute()
+            }]))
+            DatabaseManager._invalidate_comments(post_id=post_id)
+            return result
+        except ForeignKeyViolation:
+            raise
         except Exception as e:
             print(f"Database error in create_comment: {e}")
             raise
 
     @staticmethod
-    def get_comment_by_id(comment_id: int):
+    def create_comments(comments: list):
+        """Insert several comments ({"user_id", "post_id", "content"} dicts) in one multi-row insert"""
+        now = datetime.now().isoformat()
+        try:
+            result = WriteResult(get_backend().insert("comment", [
+                {"user_id": comment["user_id"], "post_id": comment["post_id"], "content": comment["content"], "date_commented": now}
+                for comment in comments
+            ]))
+            post_ids = {comment["post_id"] for comment in comments}
+            DatabaseManager.cache.delete_where(lambda key, value: key[0] == "comments" and key[1] in post_ids)
+            return result
+        except ForeignKeyViolation:
+            raise
+        except Exception as e:
+            print(f"Database error in create_comments: {e}")
+            raise
+
+    @staticmethod
+    def get_comment_by_id(comment_id: int, columns="*"):
         """Get a comment by ID"""
         try:
-            response = supabase.table("comment").select("*").eq("id", comment_id).execute()
-            return response.data[0] if response.data else None
+            rows = get_backend().select("comment", columns, filters={"id": comment_id})
+            return rows[0] if rows else None
         except Exception as e:
             print(f"Database error in get_comment_by_id: {e}")
             return None
 
     @staticmethod
-    def get_comments_by_post(post_id: int):
+    def get_comments_by_post(post_id: int, columns="*"):
         """Get all comments for a post ordered by date"""
+        cached = DatabaseManager.cache.get(("comments", post_id))
+        if cached is not MISSING:
+            return project(cached, columns)
         try:
-            response = supabase.table("comment").select("*").eq("post_id", post_id).order("date_commented", desc=False).execute()
-            return response.data if response.data else []
+            comments = get_backend().select("comment", columns, filters={"post_id": post_id}, order=COMMENTS_OLDEST_FIRST)
+            if columns == "*":
+                DatabaseManager.cache.set(("comments", post_id), comments, CACHE_TTLS["comments"])
+            return comments
         except Exception as e:
             print(f"Database error in get_comments_by_post: {e}")
             return []
 
+    @staticmethod
+    def get_comments_page(post_id: int, limit: int, after: tuple = None, columns="*"):
+        """Get up to `limit` comments for a post ordered oldest first, starting
+        after the (date_commented, id) keyset `after`"""
+        key = ("comments", post_id, limit, after)
+        cached = DatabaseManager.cache.get(key)
+        if cached is not MISSING:
+            return project(cached, columns)
+        try:
+            comments = get_backend().select(
+                "comment", columns, filters={"post_id": post_id}, order=COMMENTS_OLDEST_FIRST, limit=limit, after=after
+            )
+            if columns == "*":
+                DatabaseManager.cache.set(key, comments, CACHE_TTLS["comments"])
+            return comments
+        except Exception as e:
+            print(f"Database error in get_comments_page: {e}")
+            return []
+
+    @staticmethod
+    def get_comment_counts(post_ids: list):
+        """Number of comments on each of several posts, as {post_id: count}, in one query"""
+        if not post_ids:
+            return {}
+        try:
+            return get_backend().count_by("comment", "post_id", post_ids)
+        except Exception as e:
+            print(f"Database error in get_comment_counts: {e}")
+            return {}
+
+    @staticmethod
+    def get_first_comments(post_ids: list, per_post: int, columns="*"):
+        """The oldest `per_post` comments of each of several posts, in one query"""
+        if not post_ids or per_post < 1:
+            return []
+        try:
+            return get_backend().select_first("comment", "post_id", post_ids, per_post, columns, COMMENTS_OLDEST_FIRST)
+        except Exception as e:
+            print(f"Database error in get_first_comments: {e}")
+            return []
+
     @staticmethod
     def update_comment(comment_id: int, content: str):
         """Update comment content"""
         try:
-            return supabase.table("comment").update({
+            result = WriteResult(get_backend().update("comment", {
                 "content": content,
                 "date_commented": datetime.now().isoformat()  # Update timestamp
-            }).eq("id", comment_id).execute()
+            }, comment_id))
+            DatabaseManager._invalidate_comments(comment_id=comment_id, result=result)
+            return result
         except Exception as e:
             print(f"Database error in update_comment: {e}")
             raise
@@ -185,7 +428,9 @@ class DatabaseManager:
     def delete_comment(comment_id: int):
         """Delete a comment"""
         try:
-            return supabase.table("comment").delete().eq("id", comment_id).execute()
+            result = WriteResult(get_backend().delete("comment", comment_id))
+            DatabaseManager._invalidate_comments(comment_id=comment_id, result=result)
+            return result
         except Exception as e:
             print(f"Database error in delete_comment: {e}")
-            raise
\ No newline at end of file
+            raise
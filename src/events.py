@@ -0,0 +1,173 @@
+# src/events.py
+"""In-process pub/sub behind GET /events (Server-Sent Events).
+
+The post and comment logic publish an event after every successful write.
+Each subscriber gets its own bounded queue. Publishing never blocks on a
+slow reader. When a subscriber's queue is full its backlog is dropped and
+it is sent one "resync" event instead, telling the client to refetch
+rather than trust a stream with holes.
+
+Recent events are kept in a small replay buffer, so a client reconnecting
+with Last-Event-ID catches up without a refetch if it was not gone too
+long.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+from collections import deque
+from .versions import PROCESS_TOKEN
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "1000"))
+EVENTS_REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", "1024"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+
+RESYNC = "resync"
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+def resync_event(reason: str):
+    return {"id": None, "seq": None, "type": RESYNC, "data": {"reason": reason}}
+
+
+def format_sse(event: dict):
+    """One event in the text/event-stream wire format"""
+    lines = []
+    if event.get("id") is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'], separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """One client's view of the broker, consumed on the event loop it was created on"""
+
+    def __init__(self, broker, loop, max_queue: int):
+        self.broker = broker
+        self.loop = loop
+        self.queue = asyncio.Queue(max_queue)
+        self.lagging = False
+
+    def offer(self, event: dict):
+        """Queue an event without waiting; runs on the subscriber's loop"""
+        if self.lagging:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagging = True
+            self.broker.record_overflow()
+            # Nothing queued can be trusted to be complete any more
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(resync_event("slow consumer"))
+
+    async def get(self, timeout: float):
+        """Next event, or None after `timeout` seconds without one"""
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event["type"] == RESYNC:
+            self.lagging = False
+        return event
+
+    async def stream(self, heartbeat: float = EVENTS_HEARTBEAT):
+        """SSE text: each event as it arrives, and a comment line when idle so
+        proxies keep the connection open and dead clients are noticed"""
+        yield "retry: 3000\n\n"
+        while True:
+            event = await self.get(heartbeat)
+            yield format_sse(event) if event else ": keep-alive\n\n"
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """Fan-out of write events to every connected subscriber.
+
+    publish() is safe from any thread: the async logic calls it on the event
+    loop, the sync logic from worker threads.
+    """
+
+    def __init__(self, max_queue: int = EVENTS_QUEUE_SIZE, max_subscribers: int = EVENTS_MAX_SUBSCRIBERS,
+                 replay_size: int = EVENTS_REPLAY_SIZE):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._replay = deque(maxlen=replay_size)
+        self._ids = itertools.count(1)
+        self._published = 0
+        self._overflows = 0
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: dict):
+        with self._lock:
+            seq = next(self._ids)
+            event = {"id": f"{PROCESS_TOKEN}-{seq}", "seq": seq, "type": event_type, "data": data}
+            self._replay.append(event)
+            self._published += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The subscriber's loop is closed; it will never read again
+                self.unsubscribe(subscription)
+
+    def subscribe(self, last_event_id: str = None):
+        """Register a subscriber on the running loop.
+
+        With `last_event_id`, events published after it are queued first, or
+        a resync if they are no longer in the replay buffer.
+        """
+        subscription = Subscription(self, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(f"Event stream is full ({self.max_subscribers} subscribers)")
+            self._subscribers.add(subscription)
+            backlog = self._backlog(last_event_id)
+        for event in backlog:
+            subscription.offer(event)
+        return subscription
+
+    def _backlog(self, last_event_id: str):
+        if not last_event_id:
+            return []
+        token, _, number = last_event_id.partition("-")
+        if token != PROCESS_TOKEN or not number.isdigit():
+            # Issued by an earlier process or another worker
+            return [resync_event("unknown event id")]
+        last_id = int(number)
+        newest = self._replay[-1]["seq"] if self._replay else 0
+        oldest = self._replay[0]["seq"] if self._replay else newest + 1
+        if last_id > newest or last_id + 1 < oldest:
+            return [resync_event("missed events")]
+        return [event for event in self._replay if event["seq"] > last_id]
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def record_overflow(self):
+        with self._lock:
+            self._overflows += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self._published,
+                "overflows": self._overflows,
+            }
+
+
+# Shared by the sync and async logic layers and the API
+event_broker = EventBroker()
@@ -0,0 +1,165 @@
+# src/hashing.py
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "32"))
+# Work factor: a fixed BCRYPT_ROUNDS, or calibrated at startup to BCRYPT_TARGET_MS per hash
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "0"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "16"))
+
+
+class HasherBusyError(Exception):
+    """Raised when every hashing worker is busy and the wait queue is full"""
+
+
+def hash_rounds(hashed: str):
+    """Cost factor stored in a bcrypt hash such as $2b$12$..., or None"""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def calibrate_rounds(target_ms: float, min_rounds: int = BCRYPT_MIN_ROUNDS, max_rounds: int = BCRYPT_MAX_ROUNDS):
+    """Highest cost in [min_rounds, max_rounds] whose hash fits in target_ms.
+
+    Each extra round doubles the work, so one timing at min_rounds predicts
+    the rest; the chosen cost is then timed once to confirm the estimate.
+    """
+    def timed(rounds):
+        started = time.perf_counter()
+        bcrypt.hashpw(b"calibration-password", bcrypt.gensalt(rounds=rounds))
+        return (time.perf_counter() - started) * 1000
+
+    base_ms = timed(min_rounds)
+    rounds = min_rounds
+    while rounds < max_rounds and base_ms * 2 ** (rounds + 1 - min_rounds) <= target_ms:
+        rounds += 1
+    while rounds > min_rounds and timed(rounds) > target_ms:
+        rounds -= 1
+    return rounds
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool with a bounded queue.
+
+    bcrypt releases the GIL while it works, so threads give real
+    parallelism here. Capping workers keeps a burst of logins from taking
+    every core, and capping the queue turns overload into an immediate
+    HasherBusyError instead of an ever-growing backlog.
+    """
+
+    def __init__(self, workers: int = BCRYPT_WORKERS, max_queue: int = BCRYPT_MAX_QUEUE, rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1024)
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._latencies.append(elapsed)
+                self.completed += 1
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) on the pool, or raise HasherBusyError if it is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusyError("Password hashing is overloaded, try again shortly")
+        with self._lock:
+            self.in_flight += 1
+        future = self._executor.submit(self._timed, fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def calibrate(self, target_ms: float):
+        """Switch new hashes to the cost that matches target_ms on this machine"""
+        self.rounds = calibrate_rounds(target_ms)
+        return self.rounds
+
+    def needs_rehash(self, hashed: str):
+        """True when a stored hash was made with a different cost than the current one"""
+        return hash_rounds(hashed) != self.rounds
+
+    # ---------------- BLOCKING API ----------------
+    def hash(self, password: str):
+        hashed = self.submit(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds)).result()
+        return hashed.decode('utf-8')
+
+    def check(self, password: str, hashed: str):
+        return self.submit(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8')).result()
+
+    # ---------------- ASYNC API ----------------
+    async def ahash(self, password: str):
+        future = self.submit(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds))
+        hashed = await asyncio.wrap_future(future)
+        return hashed.decode('utf-8')
+
+    async def acheck(self, password: str, hashed: str):
+        future = self.submit(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            in_flight = self.in_flight
+            completed = self.completed
+            rejected = self.rejected
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            index = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+            return round(latencies[index] * 1000, 2)
+
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.workers),
+            "completed": completed,
+            "rejected": rejected,
+            "latency_ms": {"p50": percentile(50), "p95": percentile(95), "p99": percentile(99)},
+        }
+
+
+password_hasher = PasswordHasher()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pick the bcrypt cost for a per-hash latency budget")
+    parser.add_argument("--target-ms", type=float, default=BCRYPT_TARGET_MS or 250.0)
+    parser.add_argument("--min-rounds", type=int, default=BCRYPT_MIN_ROUNDS)
+    parser.add_argument("--max-rounds", type=int, default=BCRYPT_MAX_ROUNDS)
+    args = parser.parse_args()
+
+    chosen = calibrate_rounds(args.target_ms, args.min_rounds, args.max_rounds)
+    print(f"BCRYPT_ROUNDS={chosen}")
@@ -0,0 +1,189 @@
+# src/ingest.py
+"""Write-behind ingestion for post and comment creation (opt-in).
+
+With WRITE_BEHIND=1 the API acknowledges POST /posts and POST /comments as
+soon as the request is validated: the item gets a provisional id and joins
+a bounded in-process queue. A background task drains the queue into
+create_many() batches, one multi-row insert per flush, as soon as
+INGEST_BATCH_SIZE items are waiting or INGEST_FLUSH_INTERVAL seconds after
+the first one arrived.
+
+The write becomes visible (and its real id known) when its batch lands:
+readers see it through the usual change counters and the event stream, and
+GET /ingest/{provisional_id} reports where a given item stands. A batch
+that raises is retried with backoff, unless the insert may already have
+been committed (WriteOutcomeUnknown, e.g. a read timeout after the request
+went out): retrying that could store every row twice, so its items are
+reported as "unknown" instead. Rows the database rejects for good (such as
+a comment on a post deleted meanwhile) are reported as failed on their own
+while the rest of their batch is written. Shutdown drains the
+queue before the process exits, but items still queued when it dies
+unexpectedly are lost, which is the price of the early acknowledgement.
+"""
+import asyncio
+import itertools
+import os
+from collections import OrderedDict
+from .versions import PROCESS_TOKEN
+from .backends import WriteOutcomeUnknown
+from .logic import BATCH_MAX_SIZE
+
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0") == "1"
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_BATCH_SIZE = min(int(os.getenv("INGEST_BATCH_SIZE", "200")), BATCH_MAX_SIZE)
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.05"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "4"))
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "0.5"))
+# Outcomes kept for GET /ingest/{provisional_id}
+INGEST_STATUS_SIZE = int(os.getenv("INGEST_STATUS_SIZE", "10000"))
+
+
+class IngestQueueFull(Exception):
+    """Raised when the write-behind queue cannot take another item"""
+
+
+class WriteBehindQueue:
+    """Bounded queue of pending creations flushed through `flush(items)`.
+
+    `flush` is a create_many() coroutine: it takes a list of item dicts and
+    returns {"results": [...]} in input order, each result holding either
+    `id_field` or an "error". Runs on the event loop it was started on.
+    """
+
+    def __init__(self, kind: str, flush, id_field: str, max_queue: int = INGEST_QUEUE_SIZE,
+                 batch_size: int = INGEST_BATCH_SIZE, flush_interval: float = INGEST_FLUSH_INTERVAL,
+                 max_attempts: int = INGEST_MAX_ATTEMPTS, status_size: int = INGEST_STATUS_SIZE):
+        self.kind = kind
+        self.flush = flush
+        self.id_field = id_field
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.status_size = status_size
+        self._queue = None
+        self._task = None
+        self._ids = itertools.count(1)
+        self._status = OrderedDict()  # provisional id -> outcome
+        self._in_flight = 0
+        self._counts = {"accepted": 0, "written": 0, "failed": 0, "unknown": 0, "retries": 0, "flushes": 0}
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    @property
+    def depth(self):
+        """Items accepted but not yet written or failed, including a batch being gathered"""
+        settled = self._counts["written"] + self._counts["failed"] + self._counts["unknown"]
+        return self._counts["accepted"] - settled
+
+    def start(self):
+        self._queue = asyncio.Queue(self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Flush everything already accepted, then stop the background task"""
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def submit(self, item: dict):
+        """Queue an item and return its provisional id; raises IngestQueueFull"""
+        provisional_id = f"{self.kind}-{PROCESS_TOKEN}-{next(self._ids)}"
+        try:
+            self._queue.put_nowait((provisional_id, item))
+        except asyncio.QueueFull:
+            raise IngestQueueFull(f"Too many {self.kind}s waiting to be written, retry later")
+        self._counts["accepted"] += 1
+        self._record(provisional_id, {"status": "queued"})
+        return provisional_id
+
+    def status(self, provisional_id: str):
+        """Outcome of a submitted item, or None if it is unknown or long settled"""
+        return self._status.get(provisional_id)
+
+    def _record(self, provisional_id: str, outcome: dict):
+        self._status[provisional_id] = outcome
+        self._status.move_to_end(provisional_id)
+        while len(self._status) > self.status_size:
+            self._status.popitem(last=False)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._in_flight = len(batch)
+            settled = set()
+            try:
+                await self._write(batch, settled)
+            except Exception as e:
+                # Keep consuming: a dead task would leave later items queued for good
+                print(f"Write-behind batch of {len(batch)} {self.kind}s failed: {e!r}")
+                for provisional_id, _ in batch:
+                    if provisional_id not in settled:
+                        self._settle(provisional_id, "failed", {"error": "Write failed"})
+            finally:
+                self._in_flight = 0
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: list, settled: set):
+        """Flush `batch` and settle its items, adding their ids to `settled`"""
+        items = [item for _, item in batch]
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = await self.flush(items)
+                break
+            except WriteOutcomeUnknown as e:
+                # The rows may be in the database already; a retry could duplicate them
+                print(f"Write-behind flush of {len(items)} {self.kind}s may or may not have landed: {e}")
+                self._counts["flushes"] += 1
+                for provisional_id, _ in batch:
+                    self._settle(provisional_id, "unknown", {"error": "Write outcome unknown, not retried"})
+                    settled.add(provisional_id)
+                return
+            except Exception as e:
+                print(f"Write-behind flush of {len(items)} {self.kind}s failed (attempt {attempt}): {e}")
+                if attempt == self.max_attempts:
+                    result = {"results": [{"error": f"Not written after {attempt} attempts"}] * len(items)}
+                    break
+                self._counts["retries"] += 1
+                await asyncio.sleep(INGEST_RETRY_BACKOFF * 2 ** (attempt - 1))
+        self._counts["flushes"] += 1
+
+        results = result.get("results") or [{"error": result.get("error", "Write failed")}] * len(items)
+        for (provisional_id, _), outcome in zip(batch, results):
+            if "error" in outcome:
+                self._settle(provisional_id, "failed", {"error": outcome["error"]})
+            else:
+                self._settle(provisional_id, "written", {self.id_field: outcome[self.id_field]})
+            settled.add(provisional_id)
+
+    def _settle(self, provisional_id: str, status: str, details: dict):
+        """Record an item's final outcome and take it off the depth count"""
+        self._record(provisional_id, {"status": status, **details})
+        self._counts[status] += 1
+
+    def stats(self):
+        return {
+            "enabled": self.running,
+            "depth": self.depth,
+            "in_flight": self._in_flight,
+            "max_queue": self.max_queue,
+            **self._counts,
+        }
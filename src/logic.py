@@ -1,6 +1,244 @@
 # src/logic.py
-import bcrypt
-from .db import DatabaseManager
+import base64
+import binascii
+import json
+import os
+import threading
+from .db import DatabaseManager, ForeignKeyViolation, ID_ONLY, POSTS_NEWEST_FIRST, COMMENTS_OLDEST_FIRST, project
+from .backends import TABLE_COLUMNS
+from .hashing import password_hasher, HasherBusyError
+from .versions import change_counters
+from .search import search_index, extract_tags
+from .events import event_broker
+from .auth import session_tokens
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+DEFAULT_FEED_COMMENTS = 3
+MAX_FEED_COMMENTS = 50
+
+# "checked" (default): read the referenced rows before writing.
+# "direct": one round trip per mutation, "not found" read from the write result
+# and from foreign-key errors, so only for schemas that declare the foreign keys.
+WRITE_MODE = os.getenv("WRITE_MODE", "checked")
+FOREIGN_KEY_ERRORS = {"user_id": "User not found", "post_id": "Post not found"}
+# Read before an update or delete to check who owns the row
+OWNER_COLUMNS = ["id", "user_id"]
+NOT_OWNER_ERRORS = {"post": "Post belongs to another user", "comment": "Comment belongs to another user"}
+
+# Columns a page is always fetched with, so its next cursor can be built
+POST_KEYSET = [column for column, _ in POSTS_NEWEST_FIRST]
+COMMENT_KEYSET = [column for column, _ in COMMENTS_OLDEST_FIRST]
+
+# Most items accepted by one POST /posts/batch or /comments/batch request
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))
+
+
+# ---------------- PAGINATION ----------------
+def encode_cursor(timestamp: str, row_id: int):
+    """Encode a (timestamp, id) keyset as an opaque URL-safe cursor"""
+    raw = json.dumps([timestamp, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Decode a cursor back into its (timestamp, id) keyset, or None if invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if not isinstance(timestamp, str) or not isinstance(row_id, int) or '"' in timestamp:
+        return None
+    return timestamp, row_id
+
+
+def parse_page_request(limit: int, cursor: str):
+    """Validate page size and cursor; returns the keyset to start after, or an error dict"""
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return {"error": f"Limit must be between 1 and {MAX_PAGE_SIZE}"}
+
+    after = None
+    if cursor:
+        after = decode_cursor(cursor)
+        if after is None:
+            return {"error": "Invalid cursor"}
+    return {"limit": limit, "after": after}
+
+
+def build_page(rows: list, limit: int, timestamp_field: str):
+    """Trim a `limit + 1` row fetch to one page and derive its next cursor"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[timestamp_field], last["id"])
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+def paginate(fetch, limit: int, cursor: str, timestamp_field: str):
+    """Fetch one page through `fetch(limit, after)` and build its next cursor.
+
+    Asks for one row more than the page size so the last page can be
+    detected without a separate count query.
+    """
+    request = parse_page_request(limit, cursor)
+    if "error" in request:
+        return request
+    rows = fetch(request["limit"] + 1, request["after"])
+    return build_page(rows, request["limit"], timestamp_field)
+
+
+def assemble_feed(posts: list, comments: list, counts: dict, columns="*"):
+    """Attach its first comments and its comment count to each post, keeping `columns` of the post"""
+    by_post = {post["id"]: [] for post in posts}
+    for comment in comments:
+        by_post.setdefault(comment["post_id"], []).append(comment)
+
+    feed = []
+    for post in posts:
+        post_comments = by_post[post["id"]]
+        # A comment made between the two reads can leave the count one behind the list
+        count = max(counts.get(post["id"], 0), len(post_comments))
+        feed.append({**project(post, columns), "comments": post_comments, "comment_count": count})
+    return feed
+
+
+# ---------------- FIELDS ----------------
+def parse_fields(fields: str, table: str):
+    """Parse a comma separated `fields=` value into {"columns": [...]}.
+
+    No value means every column ("*"); unknown names give an error dict.
+    """
+    if not fields:
+        return {"columns": "*"}
+    columns = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in columns if name not in TABLE_COLUMNS[table]]
+    if not columns or unknown:
+        return {"error": f"Unknown field(s) {', '.join(unknown)}; choose from {', '.join(TABLE_COLUMNS[table])}"}
+    return {"columns": columns}
+
+
+def with_columns(columns, required: list):
+    """`columns` plus any `required` ones missing from it"""
+    if columns == "*":
+        return columns
+    return columns + [column for column in required if column not in columns]
+
+
+# ---------------- AUTHORS ----------------
+def parse_ids(ids: str):
+    """Parse a comma separated `ids=` value into {"ids": [...]} without duplicates"""
+    try:
+        parsed = list(dict.fromkeys(int(part) for part in (ids or "").split(",") if part.strip()))
+    except ValueError:
+        return {"error": "ids must be comma separated integers"}
+    if not parsed or len(parsed) > MAX_PAGE_SIZE:
+        return {"error": f"Between 1 and {MAX_PAGE_SIZE} ids are required"}
+    return {"ids": parsed}
+
+
+def with_authors(rows: list, sources: list, authors: dict):
+    """Copies of `rows` carrying the username of the author of each matching
+    `sources` row; rows may be cached, so they are never modified in place"""
+    embedded = []
+    for row, source in zip(rows, sources):
+        author = authors.get(source["user_id"])
+        embedded.append({**row, "username": author["username"] if author else None})
+    return embedded
+
+
+def feed_author_ids(posts: list, feed: list):
+    """Authors of a feed page's posts and of the comments embedded in it"""
+    return [post["user_id"] for post in posts] + [comment["user_id"] for post in feed for comment in post["comments"]]
+
+
+def embed_feed_authors(feed: list, posts: list, authors: dict):
+    feed = with_authors(feed, posts, authors)
+    for post in feed:
+        post["comments"] = with_authors(post["comments"], post["comments"], authors)
+    return feed
+
+
+# ---------------- BATCHES ----------------
+def start_batch(items: list, empty_error: str):
+    """Check the batch size and each item's content.
+
+    Returns {"results", "pending"}: one result slot per item (filled with an
+    error for rejected items) and the indexes still to be written.
+    """
+    if not items or len(items) > BATCH_MAX_SIZE:
+        return {"error": f"Batch size must be between 1 and {BATCH_MAX_SIZE}"}
+    results = [None] * len(items)
+    pending = []
+    for i, item in enumerate(items):
+        if not item["content"] or not item["content"].strip():
+            results[i] = {"index": i, "error": empty_error}
+        else:
+            pending.append(i)
+    return {"results": results, "pending": pending}
+
+
+def reject_missing(items: list, results: list, pending: list, column: str, known_ids: set):
+    """Fail pending items whose `column` is not in `known_ids`; returns the indexes left"""
+    remaining = []
+    for i in pending:
+        if items[i][column] in known_ids:
+            remaining.append(i)
+        else:
+            results[i] = {"index": i, "error": FOREIGN_KEY_ERRORS[column]}
+    return remaining
+
+
+def record_batch_writes(results: list, pending: list, rows: list, id_field: str, failed_error: str):
+    """Store the ids of inserted rows, which come back in insertion order"""
+    for position, i in enumerate(pending):
+        if position < len(rows):
+            results[i] = {"index": i, id_field: rows[position]["id"]}
+        else:
+            results[i] = {"index": i, "error": failed_error}
+
+
+def record_batch_error(results: list, pending: list, error: str):
+    for i in pending:
+        results[i] = {"index": i, "error": error}
+
+
+def finish_batch(results: list, noun: str):
+    created = sum(1 for result in results if "error" not in result)
+    return {
+        "message": f"{created} of {len(results)} {noun} created",
+        "created": created,
+        "failed": len(results) - created,
+        "results": results,
+    }
+
+
+# ---------------- CHANGE TRACKING ----------------
+def record_comment_change(event_type: str, result):
+    """Bump the version of the thread an update or delete `result` touched
+    and publish the change"""
+    rows = getattr(result, "data", None) or []
+    if not rows:
+        change_counters.bump_all()
+        return
+    change_counters.bump("comments", rows[0]["post_id"])
+    if event_type == "comment_deleted":
+        event_broker.publish(event_type, {"comment_id": rows[0]["id"], "post_id": rows[0]["post_id"]})
+    else:
+        event_broker.publish(event_type, {"comment": rows[0]})
+
+
+def check_owner(row, kind: str, user_id: int = None):
+    """Error dict if `row` (read with OWNER_COLUMNS) is missing or, when the
+    caller's `user_id` is known, belongs to someone else; None otherwise"""
+    if not row:
+        return {"error": f"{kind.capitalize()} not found"}
+    if user_id is not None and row["user_id"] != user_id:
+        return {"error": NOT_OWNER_ERRORS[kind]}
+    return None
 
 
 # ---------------- USER LOGIC ----------------
@@ -12,10 +250,10 @@ class UserLogic:
         if not username or not email or not password:
             return {"error": "Username, email, and password are required"}
 
-        if self.db.get_user_by_email(email):
+        if self.db.get_user_by_email(email, ID_ONLY):
             return {"error": "Email already exists"}
 
-        hashed_pw = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_pw = password_hasher.hash(password)
         result = self.db.create_user(username, email, hashed_pw)
         
         # Fixed: Handle Supabase response structure
@@ -23,6 +261,7 @@ class UserLogic:
             return {"error": str(result.error)}
         
         if result.data:
+            change_counters.bump("users")
             return {"message": "User registered successfully", "user_id": result.data[0]["id"]}
         else:
             return {"error": "Failed to create user"}
@@ -37,18 +276,39 @@ class UserLogic:
 
         try:
             # Check password
-            if bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+            if password_hasher.check(password, user['password']):
+                if password_hasher.needs_rehash(user['password']):
+                    threading.Thread(target=self._rehash, args=(user["id"], password), daemon=True).start()
                 user_safe = user.copy()
                 user_safe.pop("password", None)  # Remove password from response
-                return {"message": "Login successful", "user": user_safe}
+                return {"message": "Login successful", "user": user_safe, **session_tokens.issue(user_safe)}
             else:
                 return {"error": "Incorrect password"}
+        except HasherBusyError:
+            raise
         except Exception as e:
             print(f"Login error: {e}")
             return {"error": "Login failed due to server error"}
 
+    def get_many(self, ids: str):
+        """Public profiles for a comma separated id list, in the order asked for;
+        unknown ids are left out"""
+        parsed = parse_ids(ids)
+        if "error" in parsed:
+            return parsed
+        authors = self.db.get_authors(parsed["ids"])
+        return {"users": [authors[user_id] for user_id in parsed["ids"] if user_id in authors]}
+
+    def _rehash(self, user_id: int, password: str):
+        """Re-hash a just-verified password at the current bcrypt cost"""
+        try:
+            self.db.update_user(user_id, password=password_hasher.hash(password))
+        except Exception as e:
+            # Best effort: the old hash stays valid, the next login tries again
+            print(f"Rehash error for user {user_id}: {e}")
+
     def update(self, user_id: int, username: str = None, email: str = None, password: str = None):
-        user = self.db.get_user_by_id(user_id)
+        user = self.db.get_user_by_id(user_id, ID_ONLY)
         if not user:
             return {"error": "User not found"}
 
@@ -56,26 +316,31 @@ class UserLogic:
         if username:
             update_data["username"] = username
         if email:
-            existing = self.db.get_user_by_email(email)
+            existing = self.db.get_user_by_email(email, ID_ONLY)
             if existing and existing["id"] != user_id:
                 return {"error": "Email already in use"}
             update_data["email"] = email
         if password:
-            update_data["password"] = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            update_data["password"] = password_hasher.hash(password)
 
         if not update_data:
             return {"error": "No data provided to update"}
 
-        result = self.db.update_user(user_id, username, email, password)
+        result = self.db.update_user(user_id, **update_data)
         
         # Fixed: Handle Supabase response structure
         if hasattr(result, 'error') and result.error:
             return {"error": str(result.error)}
         
+        if username:
+            # Pages with embedded usernames change with it
+            change_counters.bump("users")
+        if password:
+            session_tokens.revoke_user(user_id)
         return {"message": "User updated successfully"}
 
     def delete(self, user_id: int):
-        if not self.db.get_user_by_id(user_id):
+        if not self.db.get_user_by_id(user_id, ID_ONLY):
             return {"error": "User not found"}
         
         result = self.db.delete_user(user_id)
@@ -84,45 +349,148 @@ class UserLogic:
         if hasattr(result, 'error') and result.error:
             return {"error": str(result.error)}
         
+        # Posts and comments cascade with the user
+        change_counters.bump_all()
+        session_tokens.revoke_user(user_id)
+        event_broker.publish("user_deleted", {"user_id": user_id})
         return {"message": "User deleted successfully"}
 
 
 # ---------------- POST LOGIC ----------------
 class PostLogic:
-    def __init__(self):
+    def __init__(self, write_mode: str = WRITE_MODE):
         self.db = DatabaseManager()
+        # "direct" skips the existence reads and trusts the write result instead
+        self.direct_writes = write_mode == "direct"
     
-    def create(self, user_id: int, content: str):
+    def create(self, user_id: int, content: str, authenticated: bool = False):
+        """`authenticated`: user_id comes from a verified session token, so it
+        is not looked up again"""
         if not content or not content.strip():
             return {"error": "Post content cannot be empty"}
-        if not self.db.get_user_by_id(user_id):
+        if not self.direct_writes and not authenticated and not self.db.get_user_by_id(user_id, ID_ONLY):
             return {"error": "User not found"}
         
-        result = self.db.create_post(user_id, content)
+        try:
+            result = self.db.create_post(user_id, content)
+        except ForeignKeyViolation as e:
+            return {"error": FOREIGN_KEY_ERRORS.get(e.column, "Invalid reference")}
         
         # Fixed: Handle Supabase response structure
         if hasattr(result, 'error') and result.error:
             return {"error": str(result.error)}
         
         if result.data:
+            change_counters.bump("posts")
+            search_index.add(result.data[0]["id"], content)
+            event_broker.publish("post_created", {"post": result.data[0]})
             return {"message": "Post created successfully", "post_id": result.data[0]["id"]}
         else:
             return {"error": "Failed to create post"}
 
+    def create_many(self, items: list):
+        """Create posts from {"user_id", "content"} dicts.
+
+        Every author is checked with one `in_` query and every valid post is
+        written with one multi-row insert; results follow the input order.
+        """
+        batch = start_batch(items, "Post content cannot be empty")
+        if "error" in batch:
+            return batch
+        results, pending = batch["results"], batch["pending"]
+
+        pending = self._check_references(items, results, pending)
+        while pending:
+            try:
+                result = self.db.create_posts([items[i] for i in pending])
+            except ForeignKeyViolation as e:
+                # A user was deleted after the check and the insert is all-or-nothing:
+                # fail only the posts that lost their author and write the rest again
+                remaining = self._check_references(items, results, pending)
+                if len(remaining) == len(pending):
+                    record_batch_error(results, pending, FOREIGN_KEY_ERRORS.get(e.column, "Invalid reference"))
+                    remaining = []
+                pending = remaining
+                continue
+            record_batch_writes(results, pending, result.data, "post_id", "Failed to create post")
+            change_counters.bump("posts")
+            for row in result.data:
+                search_index.add(row["id"], row["content"])
+                event_broker.publish("post_created", {"post": row})
+            break
+        return finish_batch(results, "posts")
+
+    def _check_references(self, items: list, results: list, pending: list):
+        """Fail pending items whose author does not exist; returns the indexes left"""
+        users = self.db.get_users_by_ids({items[i]["user_id"] for i in pending}, ID_ONLY)
+        return reject_missing(items, results, pending, "user_id", {user["id"] for user in users})
+
     def get_all(self):
         posts = self.db.get_all_posts()
         return posts if posts else []
 
+    def get_page(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, fields: str = None):
+        selected = parse_fields(fields, "post")
+        if "error" in selected:
+            return selected
+        columns = selected["columns"]
+
+        page = paginate(
+            lambda size, after: self.db.get_posts_page(size, after, with_columns(columns, POST_KEYSET)),
+            limit, cursor, "date_posted"
+        )
+        if "error" in page:
+            return page
+        return {"posts": project(page["items"], columns), "next_cursor": page["next_cursor"]}
+
+    def search(self, query: str, limit: int = DEFAULT_PAGE_SIZE):
+        """Posts matching every term of `query`, best match first.
+
+        The ranking comes from the in-process index; the rows themselves
+        are fetched with one `in_` query.
+        """
+        if not query or not query.strip():
+            return {"error": "Search query cannot be empty"}
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            return {"error": f"Limit must be between 1 and {MAX_PAGE_SIZE}"}
+
+        found = search_index.search(query, limit)
+        rows = {post["id"]: post for post in self.db.get_posts_by_ids([post_id for post_id, _ in found["hits"]])}
+        posts = []
+        for post_id, score in found["hits"]:
+            post = rows.get(post_id)
+            if post is None:
+                # Deleted behind the index's back, e.g. by a cascading user delete
+                search_index.remove(post_id)
+                continue
+            posts.append({**post, **extract_tags(post["content"]), "score": round(score, 4)})
+        return {"posts": posts, "total": found["total"]}
+
+    def build_search_index(self, batch_size: int = 1000):
+        """(Re)build the search index from every stored post; returns the number indexed"""
+        search_index.clear()
+        indexed, after = 0, None
+        while True:
+            rows = self.db.get_posts_page(batch_size, after, ["id", "content", "date_posted"])
+            for row in rows:
+                search_index.add(row["id"], row["content"])
+            indexed += len(rows)
+            if len(rows) < batch_size:
+                return indexed
+            after = (rows[-1]["date_posted"], rows[-1]["id"])
+
     def get(self, post_id: int):
         post = self.db.get_post_by_id(post_id)
         if not post:
             return {"error": "Post not found"}
         return post
 
-    def update(self, post_id: int, content: str):
-        post = self.db.get_post_by_id(post_id)
-        if not post:
-            return {"error": "Post not found"}
+    def update(self, post_id: int, content: str, user_id: int = None):
+        """`user_id`: the caller, from a session token; only their own post is updated"""
+        if user_id is not None or not self.direct_writes:
+            denied = check_owner(self.db.get_post_by_id(post_id, OWNER_COLUMNS), "post", user_id)
+            if denied:
+                return denied
         if not content or not content.strip():
             return {"error": "Content cannot be empty"}
         
@@ -131,46 +499,111 @@ class PostLogic:
         # Fixed: Handle Supabase response structure
         if hasattr(result, 'error') and result.error:
             return {"error": str(result.error)}
+        if self.direct_writes and not result.data:
+            return {"error": "Post not found"}
         
+        change_counters.bump("posts")
+        search_index.add(post_id, content)
+        if result.data:
+            event_broker.publish("post_updated", {"post": result.data[0]})
         return {"message": "Post updated successfully"}
 
-    def delete(self, post_id: int):
-        if not self.db.get_post_by_id(post_id):
-            return {"error": "Post not found"}
+    def delete(self, post_id: int, user_id: int = None):
+        """`user_id`: the caller, from a session token; only their own post is deleted"""
+        if user_id is not None or not self.direct_writes:
+            denied = check_owner(self.db.get_post_by_id(post_id, OWNER_COLUMNS), "post", user_id)
+            if denied:
+                return denied
         
         result = self.db.delete_post(post_id)
         
         # Fixed: Handle Supabase response structure
         if hasattr(result, 'error') and result.error:
             return {"error": str(result.error)}
+        if self.direct_writes and not result.data:
+            return {"error": "Post not found"}
         
+        change_counters.bump("posts")
+        change_counters.bump("comments", post_id)
+        search_index.remove(post_id)
+        event_broker.publish("post_deleted", {"post_id": post_id})
         return {"message": "Post deleted successfully"}
 
 
 # ---------------- COMMENT LOGIC ----------------
 class CommentLogic:
-    def __init__(self):
+    def __init__(self, write_mode: str = WRITE_MODE):
         self.db = DatabaseManager()
+        # "direct" skips the existence reads and trusts the write result instead
+        self.direct_writes = write_mode == "direct"
     
-    def create(self, user_id: int, post_id: int, content: str):
+    def create(self, user_id: int, post_id: int, content: str, authenticated: bool = False):
+        """`authenticated`: user_id comes from a verified session token, so only
+        the post is looked up"""
         if not content or not content.strip():
             return {"error": "Comment content cannot be empty"}
-        if not self.db.get_user_by_id(user_id):
-            return {"error": "User not found"}
-        if not self.db.get_post_by_id(post_id):
-            return {"error": "Post not found"}
+        if not self.direct_writes:
+            if not authenticated and not self.db.get_user_by_id(user_id, ID_ONLY):
+                return {"error": "User not found"}
+            if not self.db.get_post_by_id(post_id, ID_ONLY):
+                return {"error": "Post not found"}
         
-        result = self.db.create_comment(user_id, post_id, content)
+        try:
+            result = self.db.create_comment(user_id, post_id, content)
+        except ForeignKeyViolation as e:
+            return {"error": FOREIGN_KEY_ERRORS.get(e.column, "Invalid reference")}
         
         # Fixed: Handle Supabase response structure
         if hasattr(result, 'error') and result.error:
             return {"error": str(result.error)}
         
         if result.data:
+            change_counters.bump("comments", post_id)
+            event_broker.publish("comment_created", {"comment": result.data[0]})
             return {"message": "Comment created successfully", "comment_id": result.data[0]["id"]}
         else:
             return {"error": "Failed to create comment"}
 
+    def create_many(self, items: list):
+        """Create comments from {"user_id", "post_id", "content"} dicts.
+
+        Authors and posts are checked with one `in_` query each and every
+        valid comment is written with one multi-row insert; results follow
+        the input order.
+        """
+        batch = start_batch(items, "Comment content cannot be empty")
+        if "error" in batch:
+            return batch
+        results, pending = batch["results"], batch["pending"]
+
+        pending = self._check_references(items, results, pending)
+        while pending:
+            try:
+                result = self.db.create_comments([items[i] for i in pending])
+            except ForeignKeyViolation as e:
+                # A user or post was deleted after the check and the insert is all-or-nothing:
+                # fail only the comments that lost their author or post and write the rest again
+                remaining = self._check_references(items, results, pending)
+                if len(remaining) == len(pending):
+                    record_batch_error(results, pending, FOREIGN_KEY_ERRORS.get(e.column, "Invalid reference"))
+                    remaining = []
+                pending = remaining
+                continue
+            record_batch_writes(results, pending, result.data, "comment_id", "Failed to create comment")
+            for post_id in {items[i]["post_id"] for i in pending if "error" not in results[i]}:
+                change_counters.bump("comments", post_id)
+            for row in result.data:
+                event_broker.publish("comment_created", {"comment": row})
+            break
+        return finish_batch(results, "comments")
+
+    def _check_references(self, items: list, results: list, pending: list):
+        """Fail pending items whose author or post does not exist; returns the indexes left"""
+        users = self.db.get_users_by_ids({items[i]["user_id"] for i in pending}, ID_ONLY)
+        posts = self.db.get_posts_by_ids({items[i]["post_id"] for i in pending}, ID_ONLY)
+        pending = reject_missing(items, results, pending, "user_id", {user["id"] for user in users})
+        return reject_missing(items, results, pending, "post_id", {post["id"] for post in posts})
+
     def get(self, comment_id: int):
         comment = self.db.get_comment_by_id(comment_id)
         if not comment:
@@ -178,16 +611,40 @@ class CommentLogic:
         return comment
 
     def get_by_post(self, post_id: int):
-        if not self.db.get_post_by_id(post_id):
+        if not self.db.get_post_by_id(post_id, ID_ONLY):
             return {"error": "Post not found"}
         
         comments = self.db.get_comments_by_post(post_id)
         return comments if comments else []
 
-    def update(self, comment_id: int, content: str):
-        comment = self.db.get_comment_by_id(comment_id)
-        if not comment:
-            return {"error": "Comment not found"}
+    def get_page_by_post(self, post_id: int, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, fields: str = None, authors: bool = False):
+        """One page of a post's comments; with `authors` each carries its author's username"""
+        selected = parse_fields(fields, "comment")
+        if "error" in selected:
+            return selected
+        columns = selected["columns"]
+        required = COMMENT_KEYSET + ["user_id"] if authors else COMMENT_KEYSET
+        if not self.db.get_post_by_id(post_id, ID_ONLY):
+            return {"error": "Post not found"}
+
+        page = paginate(
+            lambda size, after: self.db.get_comments_page(post_id, size, after, with_columns(columns, required)),
+            limit, cursor, "date_commented"
+        )
+        if "error" in page:
+            return page
+        rows = page["items"]
+        comments = project(rows, columns)
+        if authors:
+            comments = with_authors(comments, rows, self.db.get_authors(row["user_id"] for row in rows))
+        return {"comments": comments, "next_cursor": page["next_cursor"]}
+
+    def update(self, comment_id: int, content: str, user_id: int = None):
+        """`user_id`: the caller, from a session token; only their own comment is updated"""
+        if user_id is not None or not self.direct_writes:
+            denied = check_owner(self.db.get_comment_by_id(comment_id, OWNER_COLUMNS), "comment", user_id)
+            if denied:
+                return denied
         if not content or not content.strip():
             return {"error": "Content cannot be empty"}
         
@@ -196,17 +653,66 @@ class CommentLogic:
         # Fixed: Handle Supabase response structure
         if hasattr(result, 'error') and result.error:
             return {"error": str(result.error)}
+        if self.direct_writes and not result.data:
+            return {"error": "Comment not found"}
         
+        record_comment_change("comment_updated", result)
         return {"message": "Comment updated successfully"}
 
-    def delete(self, comment_id: int):
-        if not self.db.get_comment_by_id(comment_id):
-            return {"error": "Comment not found"}
+    def delete(self, comment_id: int, user_id: int = None):
+        """`user_id`: the caller, from a session token; only their own comment is deleted"""
+        if user_id is not None or not self.direct_writes:
+            denied = check_owner(self.db.get_comment_by_id(comment_id, OWNER_COLUMNS), "comment", user_id)
+            if denied:
+                return denied
         
         result = self.db.delete_comment(comment_id)
         
         # Fixed: Handle Supabase response structure
         if hasattr(result, 'error') and result.error:
             return {"error": str(result.error)}
+        if self.direct_writes and not result.data:
+            return {"error": "Comment not found"}
         
-        return {"message": "Comment deleted successfully"}
\ No newline at end of file
+        record_comment_change("comment_deleted", result)
+        return {"message": "Comment deleted successfully"}
+
+
+# ---------------- FEED LOGIC ----------------
+class FeedLogic:
+    def __init__(self):
+        self.db = DatabaseManager()
+
+    def get_page(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, comments: int = DEFAULT_FEED_COMMENTS, fields: str = None,
+                 authors: bool = False):
+        """One page of posts with their first `comments` comments and a comment count.
+
+        Costs three queries regardless of page size: one for the posts, one
+        counting the comments of every post on the page, and one fetching at
+        most `comments` comments per post (skipped when it is 0). `fields`
+        picks the post columns returned. With `authors`, posts and comments
+        carry their author's username, resolved in one more lookup for the
+        whole page.
+        """
+        if comments < 0 or comments > MAX_FEED_COMMENTS:
+            return {"error": f"Comments per post must be between 0 and {MAX_FEED_COMMENTS}"}
+        selected = parse_fields(fields, "post")
+        if "error" in selected:
+            return selected
+        columns = selected["columns"]
+        required = POST_KEYSET + ["user_id"] if authors else POST_KEYSET
+
+        page = paginate(
+            lambda size, after: self.db.get_posts_page(size, after, with_columns(columns, required)),
+            limit, cursor, "date_posted"
+        )
+        if "error" in page:
+            return page
+
+        posts = page["items"]
+        post_ids = [post["id"] for post in posts]
+        counts = self.db.get_comment_counts(post_ids)
+        feed = assemble_feed(posts, self.db.get_first_comments(post_ids, comments), counts, columns)
+        if authors:
+            feed = embed_feed_authors(feed, posts, self.db.get_authors(feed_author_ids(posts, feed)))
+        return {"posts": feed, "next_cursor": page["next_cursor"]}
@@ -0,0 +1,206 @@
+# src/metrics.py
+"""Minimal in-process metrics rendered in the Prometheus text format.
+
+Counters and histograms are keyed by label values; gauges read their value
+from a callback at scrape time. Everything registers in REGISTRY, which
+GET /metrics renders.
+"""
+import functools
+import inspect
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=(), registry=REGISTRY):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labelvalues -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value: float, *labelvalues):
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {state[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value comes from `read()` at scrape time.
+
+    `read` returns a number, or a dict mapping label-value tuples to numbers.
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, read, labelnames=(), registry=REGISTRY):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.read = read
+        registry.register(self)
+
+    def samples(self):
+        value = self.read()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f"{self.name}{_labels(self.labelnames, key)} {number}" for key, number in value.items()]
+
+
+# ---------------- HTTP ----------------
+http_requests_total = Counter("http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+
+# ---------------- DATABASE ----------------
+db_calls_total = Counter("db_calls_total", "DatabaseManager method calls, cache hits included", ("method", "table"))
+db_call_errors_total = Counter("db_call_errors_total", "DatabaseManager calls that raised", ("method", "table"))
+db_call_duration = Histogram("db_call_duration_seconds", "DatabaseManager method latency", ("method", "table"))
+db_queries_total = Counter("db_queries_total", "Queries sent to the storage backend", ("operation", "table"))
+db_query_errors_total = Counter("db_query_errors_total", "Backend queries that failed", ("operation", "table"))
+db_query_duration = Histogram("db_query_duration_seconds", "Storage backend query latency", ("operation", "table"))
+
+
+def table_for(method_name: str):
+    """Table a DatabaseManager method works on, from its name"""
+    if "comment" in method_name:
+        return "comment"
+    if "post" in method_name:
+        return "post"
+    if "user" in method_name or "author" in method_name:
+        return "user"
+    return "other"
+
+
+def _timed(func, record):
+    """Wrap sync or async `func` so record(elapsed, failed, args) runs after every call"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = await func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                record(time.perf_counter() - started, failed, args)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            record(time.perf_counter() - started, failed, args)
+    return wrapper
+
+
+def instrument_methods(cls):
+    """Class decorator timing every public staticmethod of a database manager"""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("_") or not isinstance(attr, staticmethod):
+            continue
+        table = table_for(name)
+
+        def record(elapsed, failed, args, name=name, table=table):
+            db_calls_total.inc(name, table)
+            db_call_duration.observe(elapsed, name, table)
+            if failed:
+                db_call_errors_total.inc(name, table)
+
+        setattr(cls, name, staticmethod(_timed(attr.__func__, record)))
+    return cls
+
+
+class InstrumentedBackend:
+    """Proxy recording count, latency and errors of every backend query per table"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        for operation in ("select", "insert", "update", "delete", "count_by", "select_first"):
+            def record(elapsed, failed, args, operation=operation):
+                table = args[0] if args else "unknown"
+                db_queries_total.inc(operation, table)
+                db_query_duration.observe(elapsed, operation, table)
+                if failed:
+                    db_query_errors_total.inc(operation, table)
+
+            setattr(self, operation, _timed(getattr(backend, operation), record))
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
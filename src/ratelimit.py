@@ -0,0 +1,150 @@
+# src/ratelimit.py
+"""Token-bucket admission control for the API.
+
+Requests fall into three groups with separate budgets:
+
+- "auth": /login, /register and /logout, which hit bcrypt;
+- "write": every other POST, PUT, PATCH and DELETE;
+- "read": everything else.
+
+A budget "N/S" allows bursts of N requests, refilled at N per S seconds.
+Authenticated requests draw from their user's bucket, anonymous ones (and
+every auth request) from their client IP's. An optional global budget per
+group caps everyone together. "0" turns a budget off.
+
+Buckets live in an LRU dict, so each check is O(1). Buckets that have
+refilled completely hold no information; a sweep drops them every
+RATE_LIMIT_CLEANUP seconds, and RATE_LIMIT_MAX_KEYS bounds the total.
+
+Off unless RATE_LIMIT_ENABLED=1. Clients that reach the API through one
+address, such as the Streamlit app, share that address's budgets for
+anonymous requests and logins, so size them for the whole app.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "0") == "1"
+RATE_LIMITS = {
+    "auth": os.getenv("RATE_LIMIT_AUTH", "10/60"),
+    "write": os.getenv("RATE_LIMIT_WRITE", "60/60"),
+    "read": os.getenv("RATE_LIMIT_READ", "600/60"),
+}
+GLOBAL_RATE_LIMITS = {
+    "auth": os.getenv("RATE_LIMIT_GLOBAL_AUTH", "0"),
+    "write": os.getenv("RATE_LIMIT_GLOBAL_WRITE", "0"),
+    "read": os.getenv("RATE_LIMIT_GLOBAL_READ", "0"),
+}
+RATE_LIMIT_CLEANUP = float(os.getenv("RATE_LIMIT_CLEANUP", "60"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Take the client address from X-Forwarded-For; only behind a trusted proxy
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+
+AUTH_PATHS = ("/login", "/register", "/logout")
+EXEMPT_PATHS = ("/metrics",)
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+def parse_rate(value: str):
+    """(capacity, tokens per second) for an "N/S" budget, or None when off"""
+    count, _, seconds = value.partition("/")
+    capacity = float(count)
+    if capacity <= 0:
+        return None
+    return capacity, capacity / float(seconds or 1)
+
+
+def route_group(method: str, path: str):
+    """Budget a request is charged to, or None for exempt paths"""
+    if path in EXEMPT_PATHS:
+        return None
+    if path in AUTH_PATHS:
+        return "auth"
+    return "write" if method in WRITE_METHODS else "read"
+
+
+class RateLimiter:
+    """Token buckets keyed by (group, kind, id).
+
+    acquire() returns 0 when the request may proceed, else the seconds until
+    its bucket holds a token again. Thread-safe.
+    """
+
+    def __init__(self, limits: dict = None, global_limits: dict = None, max_keys: int = RATE_LIMIT_MAX_KEYS,
+                 cleanup_interval: float = RATE_LIMIT_CLEANUP):
+        self.limits = {group: parse_rate(value) for group, value in (limits or RATE_LIMITS).items()}
+        self.global_limits = {group: parse_rate(value) for group, value in (global_limits or GLOBAL_RATE_LIMITS).items()}
+        self.max_keys = max_keys
+        self.cleanup_interval = cleanup_interval
+        self._buckets = OrderedDict()  # key -> [tokens, last refill]
+        self._next_cleanup = time.monotonic() + cleanup_interval
+        self._allowed = {group: 0 for group in self.limits}
+        self._rejected = {group: 0 for group in self.limits}
+        self._lock = threading.Lock()
+
+    def _take(self, key, rate, now: float):
+        """Refill and take one token; returns the wait in seconds if there is none"""
+        capacity, per_second = rate
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [capacity, now]
+            if len(self._buckets) > self.max_keys:
+                # Forgetting a bucket only ever errs on the lenient side
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * per_second)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / per_second
+
+    def acquire(self, group: str, client: str, user_id=None):
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_cleanup:
+                self._cleanup(now)
+            wait = 0
+            rate = self.limits.get(group)
+            if rate is not None:
+                key = (group, "user", user_id) if user_id is not None and group != "auth" else (group, "ip", client)
+                wait = self._take(key, rate, now)
+            global_rate = self.global_limits.get(group)
+            if not wait and global_rate is not None:
+                wait = self._take((group, "global", None), global_rate, now)
+            if wait:
+                self._rejected[group] += 1
+            else:
+                self._allowed[group] += 1
+            return wait
+
+    def _cleanup(self, now: float):
+        """Drop buckets that have refilled to capacity since their last use"""
+        def refilled(key, bucket):
+            rate = self.global_limits[key[0]] if key[1] == "global" else self.limits[key[0]]
+            return bucket[0] + (now - bucket[1]) * rate[1] >= rate[0]
+
+        for key in [key for key, bucket in self._buckets.items() if refilled(key, bucket)]:
+            del self._buckets[key]
+        self._next_cleanup = now + self.cleanup_interval
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": RATE_LIMIT_ENABLED,
+                "buckets": len(self._buckets),
+                "allowed": dict(self._allowed),
+                "rejected": dict(self._rejected),
+            }
+
+
+def retry_after(wait: float):
+    """Retry-After header value (whole seconds, at least 1) for a wait"""
+    return str(max(1, math.ceil(wait)))
+
+
+# Shared by the API middleware
+rate_limiter = RateLimiter()
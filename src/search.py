@@ -0,0 +1,141 @@
+# src/search.py
+"""In-process inverted index for post search.
+
+Posts are tokenized into lowercase words; `#hashtags` and `@mentions` are
+indexed both as tagged terms and as plain words, so "python" finds
+"#python" while "#python" only finds the tag. A query matches posts holding
+every one of its terms, ranked by BM25.
+
+The index lives in this process: it is built at startup, kept current by
+the post logic, and does not see writes made by other processes until the
+next restart.
+"""
+import heapq
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+SEARCH_ENABLED = os.getenv("SEARCH_ENABLED", "1") != "0"
+
+TOKEN_RE = re.compile(r"[#@]?\w+")
+
+# BM25 parameters: term-frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str):
+    """Terms indexed for a post body; tags also yield their bare word"""
+    terms = []
+    for token in TOKEN_RE.findall((text or "").lower()):
+        if token[0] in "#@":
+            terms.append(token[1:])
+        terms.append(token)
+    return terms
+
+
+def query_terms(query: str):
+    """Distinct terms of a search query; a tag only matches the tag"""
+    return list(dict.fromkeys(TOKEN_RE.findall((query or "").lower())))
+
+
+def extract_tags(text: str):
+    """The hashtags and mentions of a post, lowercased and without duplicates"""
+    tokens = TOKEN_RE.findall((text or "").lower())
+    return {
+        "hashtags": list(dict.fromkeys(token for token in tokens if token[0] == "#")),
+        "mentions": list(dict.fromkeys(token for token in tokens if token[0] == "@")),
+    }
+
+
+class SearchIndex:
+    """Term -> {post_id: term frequency} postings plus per-post term counts.
+
+    Thread-safe; the sync logic runs in worker threads and the async logic
+    on the event loop, and both update the shared instance.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._documents = {}  # post_id -> Counter of its terms
+        self._lengths = {}  # post_id -> number of terms
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def add(self, post_id: int, content: str):
+        """Index a post, replacing any previous version of it"""
+        counts = Counter(tokenize(content))
+        with self._lock:
+            self._remove(post_id)
+            self._documents[post_id] = counts
+            self._lengths[post_id] = sum(counts.values())
+            self._total_length += self._lengths[post_id]
+            for term, frequency in counts.items():
+                self._postings.setdefault(term, {})[post_id] = frequency
+
+    def remove(self, post_id: int):
+        with self._lock:
+            self._remove(post_id)
+
+    def _remove(self, post_id: int):
+        counts = self._documents.pop(post_id, None)
+        if counts is None:
+            return
+        self._total_length -= self._lengths.pop(post_id)
+        for term in counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(post_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._lengths.clear()
+            self._total_length = 0
+
+    def search(self, query: str, limit: int):
+        """Top `limit` (post_id, score) pairs for posts holding every query term,
+        best first, plus the total number of matches"""
+        terms = query_terms(query)
+        if not terms:
+            return {"hits": [], "total": 0}
+        with self._lock:
+            postings = [self._postings.get(term) for term in terms]
+            if not all(postings):
+                return {"hits": [], "total": 0}
+            # Intersect from the rarest term so the candidate set only shrinks
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for other in postings[1:]:
+                candidates.intersection_update(other)
+                if not candidates:
+                    return {"hits": [], "total": 0}
+
+            documents = len(self._documents)
+            average_length = self._total_length / documents
+            weights = [math.log(1 + (documents - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+            scored = []
+            for post_id in candidates:
+                length_norm = K1 * (1 - B + B * self._lengths[post_id] / average_length)
+                score = 0.0
+                for weight, posting in zip(weights, postings):
+                    frequency = posting[post_id]
+                    score += weight * frequency * (K1 + 1) / (frequency + length_norm)
+                scored.append((score, post_id))
+
+        # Ties go to the newer post
+        best = heapq.nlargest(limit, scored)
+        return {"hits": [(post_id, score) for score, post_id in best], "total": len(candidates)}
+
+    def stats(self):
+        with self._lock:
+            return {"posts": len(self._documents), "terms": len(self._postings)}
+
+
+# Shared by the sync and async logic layers
+search_index = SearchIndex()
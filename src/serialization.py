@@ -0,0 +1,84 @@
+# src/serialization.py
+"""Fast JSON responses for the large list endpoints.
+
+Rows from the backends are already plain JSON types, so they are dumped
+directly (orjson when installed, the stdlib otherwise) instead of going
+through FastAPI's generic jsonable_encoder. Bodies above COMPRESS_MIN_SIZE
+are compressed with brotli (if installed) or gzip, whichever the client
+prefers in Accept-Encoding; COMPRESS_PREFER breaks ties.
+"""
+import gzip
+import json
+import os
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# Coding used when the client accepts both equally. At quality 4 brotli is
+# faster than gzip level 5 but its output is larger on feed pages, so gzip
+# wins ties unless BROTLI_QUALITY is raised (6 and up beats it on size)
+COMPRESS_PREFER = os.getenv("COMPRESS_PREFER", "gzip")
+
+
+def dumps(content) -> bytes:
+    """Serialize JSON-ready content to compact UTF-8 bytes"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def choose_encoding(accept_encoding: str):
+    """Best supported coding in an Accept-Encoding header: "br", "gzip" or None;
+    ties go to COMPRESS_PREFER"""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding.strip().lower()] = weight
+
+    supported = ["gzip", "br"] if brotli is not None else ["gzip"]
+    supported.sort(key=lambda coding: coding != COMPRESS_PREFER)
+    best, best_weight = None, 0.0
+    for coding in supported:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps identical bodies byte-identical
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def json_response(request, content, status_code: int = 200, headers: dict = None):
+    """JSON response serialized with `dumps` and compressed when worth it"""
+    body = dumps(content)
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    if len(body) >= COMPRESS_MIN_SIZE:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        if encoding:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
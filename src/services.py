@@ -0,0 +1,57 @@
+# src/services.py
+"""Lazily built logic objects shared by the API handlers.
+
+Nothing here is created at import time: each logic object (and the
+write-behind queues bound to them) is built on first use, so importing the
+API module stays cheap and needs no credentials. warm_up() optionally opens
+the storage connection from the FastAPI lifespan, before the first request
+instead of during it.
+"""
+import os
+import time
+from functools import cached_property
+from .backends import get_async_backend
+from .async_logic import AsyncUserLogic, AsyncPostLogic, AsyncCommentLogic, AsyncFeedLogic
+from .ingest import WriteBehindQueue
+
+# Connect to storage at startup rather than on the first request
+WARM_UP = os.getenv("WARM_UP", "0") == "1"
+
+
+class Services:
+    @cached_property
+    def users(self):
+        return AsyncUserLogic()
+
+    @cached_property
+    def posts(self):
+        return AsyncPostLogic()
+
+    @cached_property
+    def comments(self):
+        return AsyncCommentLogic()
+
+    @cached_property
+    def feed(self):
+        return AsyncFeedLogic()
+
+    @cached_property
+    def post_ingest(self):
+        """Write-behind queue for POST /posts, used when WRITE_BEHIND=1"""
+        return WriteBehindQueue("post", self.posts.create_many, "post_id")
+
+    @cached_property
+    def comment_ingest(self):
+        """Write-behind queue for POST /comments, used when WRITE_BEHIND=1"""
+        return WriteBehindQueue("comment", self.comments.create_many, "comment_id")
+
+    async def warm_up(self):
+        """Create the backend and run one tiny query so its connection is open;
+        returns the seconds it took"""
+        started = time.perf_counter()
+        await get_async_backend().select("post", ["id"], limit=1)
+        return time.perf_counter() - started
+
+
+# Shared by the API module
+services = Services()
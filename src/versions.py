@@ -0,0 +1,66 @@
+# src/versions.py
+"""Change counters behind the ETags of the list endpoints.
+
+Every write through PostLogic/CommentLogic bumps the version of the
+collection it touched, so an ETag is a few integers rather than a hash of
+the response body. Counters live in this process only:
+
+- PROCESS_TOKEN makes ETags from an earlier process (or another worker)
+  never match, since their counters started from zero too.
+- ETAG_MAX_AGE rolls every ETag over periodically, bounding how long a
+  change made by another process can hide behind a 304.
+"""
+import os
+import secrets
+import threading
+import time
+
+ETAG_MAX_AGE = float(os.getenv("ETAG_MAX_AGE", "30"))
+PROCESS_TOKEN = secrets.token_hex(4)
+
+
+class ChangeCounters:
+    """Versions of named collections, optionally split by key.
+
+    Bumping ("comments", post_id) also bumps the "comments" total, so a view
+    over every comment (the feed) changes with any thread. bump_all() covers
+    writes whose reach is unknown, such as cascading deletes.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def bump(self, name: str, key=None):
+        with self._lock:
+            self._versions[(name, None)] = self._versions.get((name, None), 0) + 1
+            if key is not None:
+                self._versions[(name, key)] = self._versions.get((name, key), 0) + 1
+
+    def bump_all(self):
+        with self._lock:
+            self._generation += 1
+
+    def etag(self, *collections):
+        """Weak ETag over `collections`, each a name or a (name, key) pair"""
+        with self._lock:
+            parts = [PROCESS_TOKEN, self._generation]
+            for collection in collections:
+                name, key = collection if isinstance(collection, tuple) else (collection, None)
+                parts.append(self._versions.get((name, key), 0))
+        if ETAG_MAX_AGE > 0:
+            parts.append(int(time.time() // ETAG_MAX_AGE))
+        return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(if_none_match: str, etag: str):
+    """Whether an If-None-Match header value covers `etag`"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+# Shared by the sync and async logic layers
+change_counters = ChangeCounters()